@@ -1,45 +1,118 @@
 # Imports
 
+import os
 import json
-import numpy as np
+import random
+import threading
 from flask import Flask, jsonify, render_template, request
-from deep_reinforcement_learning import *
+from bitboard import Board
+from solver import Solver
+from inference import QNetwork, latestCheckpoint, decodeBoards, batchResult, WEIGHTS_FILE
+from batching import MicroBatcher
+from move_cache import Model
+from game_config import MODEL_DIR, CLASSIC
 
 app = Flask(__name__)
 
-# Abrindo sessão
-sess = tf.InteractiveSession()
+# Pesos do último checkpoint em MODEL_DIR/weights.npz, calculados com NumPy (inference.py)
+# O servidor nunca importa o tensorflow: os pesos são gravados pelo treino a cada checkpoint
+# ou exportados com python inference.py
+def loadNetwork():
+    loaded = QNetwork.fromModelDir(MODEL_DIR, export = False)
+    if loaded is None and latestCheckpoint(MODEL_DIR):
+        print("{} não tem os pesos de {}: exporte-os com python inference.py".format(os.path.join(MODEL_DIR, WEIGHTS_FILE), latestCheckpoint(MODEL_DIR)))
+    return loaded
 
-# Previsões
-x , prediction, _ = createNetwork()
+# Carregando o modelo treinado, com o movimento da rede em todos os tabuleiros calculado na inicialização (move_cache.py)
+# A rede e o cache ficam no mesmo objeto: as requisições leem model uma vez e a recarga troca os dois juntos
+model = Model(loadNetwork())
 
-# Carregando o modelo treinado
-saver = tf.train.Saver()
-checkpoint = tf.train.get_checkpoint_state("model")
-
-if checkpoint and checkpoint.model_checkpoint_path:
-    s = saver.restore(sess,checkpoint.model_checkpoint_path)
-    print("Modelo carregado com sucesso:", checkpoint.model_checkpoint_path)
+if model.network:
+    print("Modelo carregado com sucesso:", model.checkpoint)
 else:
     print("Não foi possível carregar o modelo")
-graph = tf.get_default_graph()
+
+# Recargas simultâneas carregariam o mesmo checkpoint mais de uma vez
+reloadLock = threading.Lock()
+
+# As previsões de requisições simultâneas são feitas em lotes: janela de BATCH_WINDOW_MS milissegundos
+# ou até BATCH_MAX_SIZE tabuleiros por passada da rede (batching.py)
+BATCH_WINDOW_MS = float(os.environ.get('BATCH_WINDOW_MS', '2'))
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '64'))
+batcher = MicroBatcher(lambda boards: model.network.bestLegalMoves(boards)[0], BATCH_MAX_SIZE, BATCH_WINDOW_MS / 1000)
+
+# Máximo de tabuleiros por requisição em /api/ticky/batch
+MAX_BATCH_BOARDS = int(os.environ.get('MAX_BATCH_BOARDS', '100000'))
+
+# Solucionador exato (só no 3x3): livro de aberturas nas primeiras jogadas e alternativa quando a rede prevê uma casa ocupada
+solver = Solver.loadOrBuild() if CLASSIC else None
+OPENING_BOOK_PLIES = int(os.environ.get('OPENING_BOOK_PLIES', '2'))
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-def  bestmove(input):
-    global graph
-    with graph.as_default():
-        data = (sess.run(tf.argmax(prediction.eval(session = sess,feed_dict={x:[input]}),1)))
-    return data
-
 @app.route('/api/ticky', methods=['POST'])
 def ticky_api():
     data = request.get_json()
-    data = np.array(data['data'])
-    data = data.tolist()
-    return jsonify(np.asscalar(bestmove(data)[0]))
+    board = Board.fromArray(data['data'])
+    playable = not board.isGameOver() and not board.isFull()
+
+    if solver and playable and bin(board.x | board.o).count('1') < OPENING_BOOK_PLIES:
+        return jsonify(solver.bestMove(board.x, board.o))
+
+    current = model
+    move = current.moveCache.move(board) if current.moveCache else None
+    if move is None and current.network:
+        move = int(batcher.predict(board.toArray()))
+    if playable and (move is None or not board.isEmpty(move)):
+        move = solver.bestMove(board.x, board.o) if solver else random.choice(board.legalMoves())
+    return jsonify(move)
+
+# Avaliação de vários tabuleiros de uma vez, com os movimentos ilegais excluídos
+# JSON {"boards": [[...], ...], "q": true} ou o corpo em bytes int8 (application/octet-stream, ?q=1 para os valores Q)
+@app.route('/api/ticky/batch', methods=['POST'])
+def ticky_batch_api():
+    try:
+        if request.mimetype == 'application/octet-stream':
+            boards = decodeBoards(request.get_data(), True, MAX_BATCH_BOARDS)
+            withQ = request.args.get('q') in ('1', 'true')
+        else:
+            data = request.get_json(force = True)
+            boards = decodeBoards(data['boards'], False, MAX_BATCH_BOARDS)
+            withQ = bool(data.get('q'))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    current = model
+    if not current.network:
+        return jsonify({'error': "Modelo não carregado"}), 503
+    return jsonify(batchResult(current.network, boards, withQ))
+
+# Tamanho dos lotes e tempo de espera na fila das previsões
+@app.route('/api/ticky/metrics')
+def ticky_metrics():
+    return jsonify(batcher.metrics())
+
+# Carrega os pesos do último checkpoint, se for outro, e recria o cache de movimentos
+# Uma recarga por vez; o novo modelo só é publicado depois de a rede e o cache estarem prontos
+def reloadModel():
+    global model
+    with reloadLock:
+        latest = latestCheckpoint(MODEL_DIR)
+        if not latest or latest == model.checkpoint:
+            return False
+
+        network = loadNetwork()
+        if not network:
+            return False
+        model = Model(network)
+    print("Modelo carregado com sucesso:", model.checkpoint)
+    return True
+
+@app.route('/api/ticky/reload', methods=['POST'])
+def ticky_reload():
+    return jsonify({'reloaded': reloadModel(), 'checkpoint': model.checkpoint})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0',port=81)
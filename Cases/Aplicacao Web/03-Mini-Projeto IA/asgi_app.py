@@ -0,0 +1,176 @@
+# Modo de produção da API: a mesma /api/ticky da app.py em Starlette (ASGI), servida pelo uvicorn com vários processos
+# Os processos mapeiam em memória o mesmo arquivo de pesos (MODEL_DIR/weights.npy), então as páginas são
+# compartilhadas pelo sistema operacional. Cada processo observa MODEL_DIR/checkpoint e, quando o treino grava
+# um checkpoint novo, carrega os pesos e recria o cache de movimentos em uma thread, trocando o modelo de uma vez:
+# as requisições em andamento terminam com o modelo anterior e o servidor não é reiniciado.
+# Os workers só leem weights.npy (gravado pelo treino antes de o checkpoint passar a ser o último) e nunca
+# exportam pesos; só o processo principal, ao iniciar, gera o arquivo se ele faltar.
+
+# Imports
+import os
+import random
+import asyncio
+import argparse
+import contextlib
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+from bitboard import Board
+from solver import Solver
+from inference import QNetwork, latestCheckpoint, saveFlatWeights, decodeBoards, batchResult, FLAT_WEIGHTS_FILE
+from batching import MicroBatcher
+from move_cache import Model
+from game_config import MODEL_DIR, CLASSIC
+
+# Configuração (como na app.py) e intervalo, em segundos, entre as verificações de MODEL_DIR/checkpoint
+OPENING_BOOK_PLIES = int(os.environ.get('OPENING_BOOK_PLIES', '2'))
+BATCH_WINDOW_MS = float(os.environ.get('BATCH_WINDOW_MS', '2'))
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '64'))
+MAX_BATCH_BOARDS = int(os.environ.get('MAX_BATCH_BOARDS', '100000'))
+WATCH_INTERVAL = float(os.environ.get('WATCH_INTERVAL', '1'))
+
+
+# Gera MODEL_DIR/weights.npy se ele não existir ou for de outro checkpoint (treino anterior a este arquivo)
+# Só o processo principal chama esta função, antes de os workers começarem: exportar pode importar o tensorflow
+def prepareFlatWeights(directory = MODEL_DIR):
+    latest = latestCheckpoint(directory)
+    path = os.path.join(directory, FLAT_WEIGHTS_FILE)
+    if latest and (not os.path.exists(path) or QNetwork.loadFlat(path).checkpoint != latest):
+
+        # Sem o tensorflow ou sem os arquivos .data do checkpoint, os workers começam sem modelo
+        try:
+            network = QNetwork.fromModelDir(directory)
+        except Exception as e:
+            print("Não foi possível exportar os pesos de {}: {}".format(latest, e))
+            return
+        saveFlatWeights(path, network.layers, network.checkpoint)
+
+# Modelo de MODEL_DIR/weights.npy, sem nunca exportar os pesos; None se o arquivo não existir
+# ou, com checkpoint, se ele ainda não for desse checkpoint
+def loadModel(checkpoint = None):
+    path = os.path.join(MODEL_DIR, FLAT_WEIGHTS_FILE)
+    if not os.path.exists(path):
+        return None
+
+    network = QNetwork.loadFlat(path)
+    if checkpoint and network.checkpoint != checkpoint:
+        return None
+    return Model(network)
+
+
+model = Model()
+batcher = MicroBatcher(lambda boards: model.network.bestLegalMoves(boards)[0], BATCH_MAX_SIZE, BATCH_WINDOW_MS / 1000)
+solver = Solver.loadOrBuild() if CLASSIC else None
+
+# Páginas e arquivos estáticos da app.py, a partir do diretório deste arquivo (como no Flask)
+root = os.path.dirname(os.path.abspath(__file__))
+templates = Jinja2Templates(directory = os.path.join(root, 'templates'))
+templates.env.globals['url_for'] = lambda endpoint, filename: '/{}/{}'.format(endpoint, filename)
+
+
+# Troca o modelo quando MODEL_DIR/checkpoint aponta para outro checkpoint
+async def watchCheckpoints():
+    global model
+    checkpointFile = os.path.join(MODEL_DIR, 'checkpoint')
+    loop = asyncio.get_running_loop()
+    modified = None
+
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        try:
+            current = os.stat(checkpointFile).st_mtime_ns
+        except OSError:
+            continue
+        latest = latestCheckpoint(MODEL_DIR)
+        if current == modified or latest == model.checkpoint:
+            modified = current
+            continue
+
+        # Se weights.npy ainda não for do último checkpoint, o modelo atual continua e a troca é tentada de novo
+        try:
+            loaded = await loop.run_in_executor(None, loadModel, latest)
+        except Exception as e:
+            print("Erro ao carregar o modelo: {}".format(e))
+            continue
+        if loaded:
+            model = loaded
+            modified = current
+            print("Modelo carregado com sucesso:", model.checkpoint)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global model
+    model = await asyncio.get_running_loop().run_in_executor(None, loadModel) or Model()
+    if model.network:
+        print("Modelo carregado com sucesso:", model.checkpoint)
+    else:
+        print("Não foi possível carregar o modelo")
+
+    watcher = asyncio.create_task(watchCheckpoints())
+    yield
+    watcher.cancel()
+
+
+async def index(request):
+    return templates.TemplateResponse(request, 'index.html')
+
+async def ticky_api(request):
+    data = await request.json()
+    board = Board.fromArray(data['data'])
+    playable = not board.isGameOver() and not board.isFull()
+
+    if solver and playable and bin(board.x | board.o).count('1') < OPENING_BOOK_PLIES:
+        return JSONResponse(solver.bestMove(board.x, board.o))
+
+    current = model
+    move = current.moveCache.move(board) if current.moveCache else None
+    if move is None and current.network:
+        move = int(await asyncio.wrap_future(batcher.submit(board.toArray())))
+    if playable and (move is None or not board.isEmpty(move)):
+        move = solver.bestMove(board.x, board.o) if solver else random.choice(board.legalMoves())
+    return JSONResponse(move)
+
+# Avaliação de vários tabuleiros de uma vez (mesmo formato da app.py), calculada em uma thread
+async def ticky_batch_api(request):
+    try:
+        if request.headers.get('content-type', '').startswith('application/octet-stream'):
+            boards = decodeBoards(await request.body(), True, MAX_BATCH_BOARDS)
+            withQ = request.query_params.get('q') in ('1', 'true')
+        else:
+            data = await request.json()
+            boards = decodeBoards(data['boards'], False, MAX_BATCH_BOARDS)
+            withQ = bool(data.get('q'))
+    except (ValueError, KeyError, TypeError) as e:
+        return JSONResponse({'error': str(e)}, status_code = 400)
+
+    current = model
+    if not current.network:
+        return JSONResponse({'error': "Modelo não carregado"}, status_code = 503)
+    return JSONResponse(await asyncio.get_running_loop().run_in_executor(None, batchResult, current.network, boards, withQ))
+
+# Métricas dos lotes e o checkpoint em uso por este processo
+async def ticky_metrics(request):
+    return JSONResponse(dict(batcher.metrics(), checkpoint = model.checkpoint, pid = os.getpid()))
+
+
+app = Starlette(routes = [Route('/', index),
+                          Route('/api/ticky', ticky_api, methods = ['POST']),
+                          Route('/api/ticky/batch', ticky_batch_api, methods = ['POST']),
+                          Route('/api/ticky/metrics', ticky_metrics),
+                          Mount('/static', StaticFiles(directory = os.path.join(root, 'static')), name = 'static')],
+                lifespan = lifespan)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description = 'API do Tic Tac Toe com vários processos e troca do modelo sem reiniciar')
+    parser.add_argument('--host', default = '0.0.0.0')
+    parser.add_argument('--port', type = int, default = 81)
+    parser.add_argument('--workers', type = int, default = os.cpu_count())
+    args = parser.parse_args()
+
+    # O arquivo de pesos é preparado uma vez, antes de os processos começarem
+    prepareFlatWeights(MODEL_DIR)
+    uvicorn.run('asgi_app:app', host = args.host, port = args.port, workers = args.workers)
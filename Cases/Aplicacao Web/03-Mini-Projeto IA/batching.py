@@ -0,0 +1,94 @@
+# Agrupamento das previsões em lotes (micro-batching)
+# As requisições entregam um tabuleiro e recebem um Future; uma thread junta os tabuleiros que chegam
+# dentro de uma janela curta (ou até maxBatch tabuleiros), faz uma única passada da rede pelo lote
+# e resolve o Future de cada requisição com o seu movimento.
+
+# Imports
+import time
+import queue
+import threading
+import numpy as np
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+
+    # function recebe os tabuleiros (N, boardSize) e retorna um resultado por tabuleiro (ex.: o primeiro item de QNetwork.bestLegalMoves)
+    # window: segundos que o primeiro tabuleiro do lote espera por outros (0: só os que já estão na fila)
+    def __init__(self, function, maxBatch = 64, window = 0.002):
+        self.function = function
+        self.maxBatch = maxBatch
+        self.window = window
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.resetMetrics()
+
+        self.thread = threading.Thread(target = self._run, name = 'micro-batcher', daemon = True)
+        self.thread.start()
+
+    def resetMetrics(self):
+        with self.lock:
+            self.batches = 0
+            self.requests = 0
+            self.batchSizes = {}
+            self.totalWait = 0.0
+            self.maxWait = 0.0
+            self.totalRun = 0.0
+
+    # Agenda um tabuleiro e retorna o Future do seu resultado
+    def submit(self, board):
+        future = Future()
+        self.queue.put((np.array(board, dtype = np.float32).reshape(-1), future, time.perf_counter()))
+        return future
+
+    # Resultado de um tabuleiro, esperando o lote em que ele entrar
+    def predict(self, board, timeout = None):
+        return self.submit(board).result(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = batch[0][2] + self.window
+
+            while len(batch) < self.maxBatch:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    batch.append(self.queue.get(timeout = remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            try:
+                results = self.function(np.stack([board for board, _, _ in batch]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            self._record(batch, started, time.perf_counter())
+
+    def _record(self, batch, started, finished):
+        waits = [started - submitted for _, _, submitted in batch]
+        with self.lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.batchSizes[len(batch)] = self.batchSizes.get(len(batch), 0) + 1
+            self.totalWait += sum(waits)
+            self.maxWait = max(self.maxWait, max(waits))
+            self.totalRun += finished - started
+
+    # Tamanho dos lotes e espera na fila (em milissegundos) desde o início ou o último resetMetrics
+    def metrics(self):
+        with self.lock:
+            return {'batches': self.batches,
+                    'requests': self.requests,
+                    'meanBatchSize': self.requests / self.batches if self.batches else None,
+                    'maxBatchSize': max(self.batchSizes) if self.batchSizes else None,
+                    'batchSizes': {str(size): count for size, count in sorted(self.batchSizes.items())},
+                    'meanQueueWaitMs': 1000 * self.totalWait / self.requests if self.requests else None,
+                    'maxQueueWaitMs': 1000 * self.maxWait,
+                    'meanBatchTimeMs': 1000 * self.totalRun / self.batches if self.batches else None,
+                    'queued': self.queue.qsize(),
+                    'maxBatch': self.maxBatch,
+                    'windowMs': 1000 * self.window}
@@ -0,0 +1,120 @@
+# Representação compacta do tabuleiro: as casas de X (1) e de O (-1) são dois inteiros com um bit por casa
+# O bit i corresponde à casa i do tabuleiro linear (linha * cols + coluna).
+# Em tabuleiros pequenos (até 16 casas), vitórias, movimentos legais e a entrada da rede vêm de
+# tabelas pré-calculadas com 2^boardSize entradas (512 no 3x3). Nos maiores, as vitórias são
+# verificadas só nas sequências que passam pela última casa jogada.
+
+# Imports
+import numpy as np
+from game_config import boardSize, LINE_INDEXES, LINES_THROUGH
+
+# Variáveis
+FULL = (1 << boardSize) - 1
+TABLES = boardSize <= 16
+
+# Máscaras das sequências que vencem o jogo, e as que passam por cada casa
+LINE_MASKS = [sum(1 << int(i) for i in line) for line in LINE_INDEXES]
+MASKS_THROUGH = [[LINE_MASKS[l] for l in lines] for lines in LINES_THROUGH]
+
+if TABLES:
+
+    # WIN_TABLE[m]: as casas m contêm uma sequência completa
+    WIN_TABLE = np.zeros(1 << boardSize, dtype = bool)
+    for line in LINE_MASKS:
+        WIN_TABLE[(np.arange(1 << boardSize) & line) == line] = True
+
+    # LEGAL_MOVES[m]: casas livres quando as casas ocupadas são m
+    LEGAL_MOVES = tuple(tuple(i for i in range(boardSize) if not m >> i & 1) for m in range(1 << boardSize))
+
+    # BITS[m]: vetor de 0/1 das casas de m, usado para montar a entrada da rede
+    BITS = ((np.arange(1 << boardSize)[:, None] >> np.arange(boardSize)) & 1).astype(np.float32)
+    BITS_INT = BITS.astype(np.int8)
+
+    def isWin(m):
+        return WIN_TABLE[m]
+
+    def legalMoves(occupied):
+        return LEGAL_MOVES[occupied]
+
+    def bits(m, dtype = np.float32):
+        return BITS[m] if dtype == np.float32 else BITS_INT[m]
+
+else:
+
+    def isWin(m):
+        return any(m & line == line for line in LINE_MASKS)
+
+    def legalMoves(occupied):
+        return tuple(i for i in range(boardSize) if not occupied >> i & 1)
+
+    def bits(m, dtype = np.float32):
+        packed = np.frombuffer(m.to_bytes((boardSize + 7) // 8, 'little'), dtype = np.uint8)
+        return np.unpackbits(packed, bitorder = 'little')[:boardSize].astype(dtype)
+
+
+class Board:
+    __slots__ = ('x', 'o')
+
+    def __init__(self, x = 0, o = 0):
+        self.x = x
+        self.o = o
+
+    # Cria a partir de um tabuleiro linear ou rows x cols com 1, -1 e 0
+    @classmethod
+    def fromArray(cls, board):
+        x = o = 0
+        for i, item in enumerate(np.ravel(board)):
+            if item == 1:
+                x |= 1 << i
+            elif item == -1:
+                o |= 1 << i
+        return cls(x, o)
+
+    def copy(self):
+        return Board(self.x, self.o)
+
+    # Marca uma casa para o jogador (1 ou -1)
+    def play(self, index, player):
+        index = int(index)
+        if player == 1:
+            self.x |= 1 << index
+        else:
+            self.o |= 1 << index
+
+    # Troca X's por O's e vice-versa
+    def inverse(self):
+        return Board(self.o, self.x)
+
+    def isEmpty(self, index):
+        return not (self.x | self.o) >> int(index) & 1
+
+    def legalMoves(self):
+        return legalMoves(self.x | self.o)
+
+    def isFull(self):
+        return self.x | self.o == FULL
+
+    # O jogador (1 ou -1) completou uma sequência
+    def wins(self, player):
+        return isWin(self.x if player == 1 else self.o)
+
+    # O jogador completou uma sequência passando pela casa index (a última que jogou)
+    def winsWith(self, player, index):
+        m = self.x if player == 1 else self.o
+        return any(m & line == line for line in MASKS_THROUGH[int(index)])
+
+    # Qualquer jogador completou uma sequência
+    def isGameOver(self):
+        return isWin(self.x) or isWin(self.o)
+
+    # Escreve a entrada da rede (1, -1 e 0) em out, sem alocar um novo array nos tabuleiros pequenos
+    def toInput(self, out):
+        return np.subtract(bits(self.x), bits(self.o), out = out)
+
+    # Entrada da rede do ponto de vista do oponente
+    def toInverseInput(self, out):
+        return np.subtract(bits(self.o), bits(self.x), out = out)
+
+    # Tabuleiro linear em int8, para guardar na memória do jogo
+    def toArray(self):
+        return bits(self.x, np.int8) - bits(self.o, np.int8)
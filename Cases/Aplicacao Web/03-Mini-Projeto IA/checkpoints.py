@@ -0,0 +1,142 @@
+# Gerenciamento dos checkpoints do treino
+# Os pesos são copiados da sessão de treino (um sess.run) e gravados em segundo plano, por uma thread
+# com o seu próprio grafo e sessão, para que o treino não pare esperando o disco.
+# Ficam os últimos checkpoints e o melhor pela pontuação de avaliação; os metadados de cada um
+# (iteração, epsilon, vitórias/derrotas/empates, tempos) ficam em manifest.json no mesmo diretório.
+# Com weightsFile, as camadas da rede também são gravadas para a inferência sem o tensorflow (inference.py),
+# no .npz e, ao lado, no .npy que a API mapeia em memória.
+
+# Imports
+import os
+import glob
+import json
+import time
+import queue
+import threading
+import tensorflow as tf
+from inference import saveWeights, saveFlatWeights, LAYER_VARIABLES
+
+
+class CheckpointManager:
+
+    def __init__(self, directory, variables, keep = 5, prefix = 'model.ckpt', weightsFile = None):
+        self.directory = directory
+        self.variables = variables
+        self.weightsFile = weightsFile
+        self.keep = keep
+        self.prefix = prefix
+        self.manifestFile = os.path.join(directory, 'manifest.json')
+        self.manifest = self.readManifest()
+        self.adoptCheckpoints()
+        os.makedirs(directory, exist_ok = True)
+
+        # Grafo próprio: variáveis com os mesmos nomes no checkpoint, inicializadas a partir de placeholders
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.placeholders = [tf.placeholder(variable.dtype.base_dtype, variable.shape) for variable in variables]
+            snapshots = [tf.Variable(placeholder, name = 'snapshot_{}'.format(index)) for index, placeholder in enumerate(self.placeholders)]
+            self.assign = tf.group(*[snapshot.initializer for snapshot in snapshots])
+
+            # write_meta_graph=False nos saves: a restauração usa o grafo já criado pelo código
+            self.saver = tf.train.Saver({variable.op.name: snapshot for variable, snapshot in zip(variables, snapshots)}, max_to_keep = None)
+            self.sess = tf.Session()
+
+        # Um checkpoint pendente por vez; se o disco estiver lento o próximo save espera
+        self.queue = queue.Queue(maxsize = 1)
+        self.thread = threading.Thread(target = self._run, name = 'checkpoints', daemon = True)
+        self.thread.start()
+
+    def readManifest(self):
+        try:
+            with open(self.manifestFile) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'checkpoints': [], 'best': None}
+
+    # Checkpoints no diretório que não estão no manifesto (gravados antes dele) entram na lista em ordem
+    # de iteração, como os demais: o primeiro save já mantém só os últimos keep e apaga os outros
+    def adoptCheckpoints(self):
+        listed = {item['path'] for item in self.manifest['checkpoints']}
+        adopted = []
+        for index in glob.glob(os.path.join(self.directory, self.prefix + '-*.index')):
+            name = os.path.basename(index)[:-len('.index')]
+            step = name[len(self.prefix) + 1:]
+            if name not in listed and step.isdigit():
+                adopted.append({'step': int(step), 'path': name})
+
+        if adopted:
+            self.manifest['checkpoints'] = sorted(adopted + self.manifest['checkpoints'], key = lambda item: item['step'])
+
+    def writeManifest(self):
+        temporary = self.manifestFile + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.manifest, f, indent = 2)
+        os.replace(temporary, self.manifestFile)
+
+    # Copia os pesos da sessão de treino e agenda a gravação
+    # metadata deve ter 'score' (maior é melhor) e o que for necessário para retomar o treino
+    def save(self, sess, step, metadata):
+        values = sess.run(self.variables)
+        self.queue.put((step, values, metadata))
+
+    def _run(self):
+        while True:
+            step, values, metadata = self.queue.get()
+            try:
+                self._write(step, values, metadata)
+            except Exception as e:
+                print("Erro ao gravar o checkpoint {}: {}".format(step, e))
+            finally:
+                self.queue.task_done()
+
+    def _write(self, step, values, metadata):
+        started = time.time()
+        self.sess.run(self.assign, feed_dict = dict(zip(self.placeholders, values)))
+        path = self.saver.save(self.sess, os.path.join(self.directory, self.prefix), global_step = step, write_meta_graph = False, write_state = False)
+
+        # Os pesos da inferência são gravados antes de o checkpoint passar a ser o último
+        # (write_state = False: só o update_checkpoint_state abaixo muda o arquivo checkpoint)
+        if self.weightsFile:
+            named = {variable.op.name: value for variable, value in zip(self.variables, values)}
+            layers = [named[name] for name in LAYER_VARIABLES]
+            saveWeights(self.weightsFile, layers, os.path.basename(path))
+            saveFlatWeights(os.path.splitext(self.weightsFile)[0] + '.npy', layers, os.path.basename(path))
+
+        entry = dict(metadata, step = step, path = os.path.basename(path), savedAt = time.time(), saveTime = time.time() - started)
+        checkpoints = [item for item in self.manifest['checkpoints'] if item['step'] != step] + [entry]
+
+        best = self.manifest.get('best')
+        bestEntry = next((item for item in checkpoints if item['step'] == best), None)
+        if entry.get('score') is not None and (bestEntry is None or bestEntry.get('score') is None or entry['score'] >= bestEntry['score']):
+            best = step
+
+        # Ficam os últimos keep checkpoints e o melhor
+        kept = [item for index, item in enumerate(checkpoints) if index >= len(checkpoints) - self.keep or item['step'] == best]
+        for item in checkpoints:
+            if item not in kept:
+                for arquivo in glob.glob(os.path.join(self.directory, item['path'] + '.*')):
+                    os.remove(arquivo)
+
+        self.manifest = {'checkpoints': kept, 'best': best}
+        self.writeManifest()
+        tf.train.update_checkpoint_state(self.directory, os.path.join(self.directory, entry['path']),
+                                         all_model_checkpoint_paths = [os.path.join(self.directory, item['path']) for item in kept])
+
+    # Espera as gravações pendentes
+    def flush(self):
+        self.queue.join()
+
+    # Restaura o último checkpoint na sessão de treino (sem importar o .meta) e retorna os seus metadados
+    def restore(self, sess, saver):
+        checkpoint = tf.train.get_checkpoint_state(self.directory)
+        if not checkpoint or not checkpoint.model_checkpoint_path:
+            return None
+
+        saver.restore(sess, checkpoint.model_checkpoint_path)
+        name = os.path.basename(checkpoint.model_checkpoint_path)
+        entry = next((item for item in self.manifest['checkpoints'] if item['path'] == name), None)
+        if entry is None:
+
+            # Checkpoint anterior ao manifesto: só a iteração, a partir do nome do arquivo
+            entry = {'step': int(name.split('-')[1]), 'path': name}
+        return entry
@@ -1,5 +1,7 @@
 # Um Programa Python para implementar o Aprendizado de Máquina para o Jogo Tic Tac Toe (3x3) 
 # usando Aprendizado por Reforço (técnica de aprendizado Q) e tensorflow.
+# O tamanho do tabuleiro e o número de peças em sequência podem ser alterados em game_config.py
+# (variáveis de ambiente GAME_ROWS, GAME_COLS e WINNING_LENGTH).
 
 # Imports
 import time
@@ -9,16 +11,29 @@ import numpy as np
 from pathlib import Path
 import os
 import sys
+import atexit
+import argparse
+from replay_buffer import ReplayMemory
+from self_play import SelfPlayPool
+from vector_env import VectorTicTacToe
+from bitboard import Board
+from solver import Solver
+import game_config
+from game_config import MODEL_DIR, CLASSIC
+from checkpoints import CheckpointManager
+from inference import WEIGHTS_FILE
+from telemetry import Telemetry, TELEMETRY_FILE
 
 # Variáveis
-game_rows = rows = 3
-game_cols = cols = 3
-winning_length = 3
+game_rows = rows = game_config.rows
+game_cols = cols = game_config.cols
+winning_length = game_config.winning_length
 boardSize = rows * cols
 actions = rows * cols
 won_games = 0
 lost_games = 0
 draw_games = 0
+forward_passes = 0
 layer_1_w = 750
 layer_2_w = 750
 layer_3_w = 750
@@ -41,78 +56,6 @@ epsilon = 1.0
 GAMMA = 0.9
 
 
-# troca X's por O's e vice-versa
-def InverseBoard(board):
-    temp_board = np.copy(board)
-    rows, cols = temp_board.shape
-    for r in range(rows):
-        for c in range(cols):
-            temp_board[r,c] *= -1
-    return temp_board.reshape([-1])
-
-def isGameOver(board):
-    temp = None
-    rows , cols = board.shape
-
-    ## Linhas
-    for i in range(rows):
-        temp = getRowSum(board, i)
-        if checkValue(temp):
-            return True
-    ## Colunas
-    for i in range(cols):
-        temp = getColSum(board, i)
-        if checkValue(temp):
-            return True
-
-    ## Diagonais
-    temp = getRightDig(board)
-    if checkValue(temp):
-        return True
-
-    temp = getLeftDig(board)
-    if checkValue(temp):
-        return True
-
-    return False
-
-def getRowSum(board , r):
-    rows , cols = board.shape
-    sum = 0
-    for c in range(cols):
-        sum = sum + board[r,c]
-    return sum
-
-def getColSum(board , c):
-    rows , cols = board.shape
-    sum = 0
-    for r in range(rows):
-        sum = sum + board[r,c]
-    return sum
-
-def getLeftDig(board):
-    rows , cols = board.shape
-    sum = 0
-    for i in range(rows):
-        sum = sum + board[i,i]
-    return sum
-
-def getRightDig(board):
-    rows , cols = board.shape
-    sum = 0
-    i = rows - 1
-    j = 0
-    while i >= 0:
-        sum += board[i,j]
-        i = i - 1
-        j = j + 1
-    return sum
-
-def checkValue(sum):
-    if sum == -3 or sum == 3:
-        return True
-
-
 # Cria a rede
 def createNetwork():
 
@@ -143,15 +86,114 @@ def createNetwork():
     return x,y, prediction
 
 
-def tainNetwork():
+# Calcula os valores Q alvo de um minibatch inteiro com uma única passada pela rede
+# Retorna também o erro TD da ação tomada (usado nas prioridades da memória de repetição)
+# target = (entrada, saída) da rede alvo: os próximos estados são avaliados pela cópia congelada, no mesmo sess.run
+# doubleQ: o melhor próximo movimento é escolhido pela rede treinada e avaliado pela rede alvo (Double DQN)
+def batchTargets(sess, inputState, Qoutputs, states, actionsTaken, rewards, nextStates, dones, target = None, doubleQ = False):
+    size = len(states)
+
+    if target is None:
+
+        # Estados atuais e próximos estados vão juntos na mesma passada
+        allQ = sess.run(Qoutputs, feed_dict={inputState: np.concatenate([states, nextStates])})
+        targetQ, nextQ = allQ[:size], allQ[size:]
+        bestNextQ = np.max(nextQ, axis = 1)
+    else:
+        frozenState, frozenQoutputs = target
+        if doubleQ:
+            allQ, frozenNextQ = sess.run([Qoutputs, frozenQoutputs], feed_dict={inputState: np.concatenate([states, nextStates]), frozenState: nextStates})
+            targetQ, nextQ = allQ[:size], allQ[size:]
+            bestNextQ = frozenNextQ[np.arange(size), np.argmax(nextQ, axis = 1)]
+        else:
+            targetQ, frozenNextQ = sess.run([Qoutputs, frozenQoutputs], feed_dict={inputState: states, frozenState: nextStates})
+            bestNextQ = np.max(frozenNextQ, axis = 1)
+
+    # Recompensa -1 para todos os movimentos ilegais, como no modo por amostra
+    targetQ[states != 0] = -1
+
+    # Estado final: recompensa do jogo; demais: valor descontado do melhor próximo movimento
+    targets = np.where(dones, rewards, GAMMA * bestNextQ)
+    tdErrors = targets - targetQ[np.arange(size), actionsTaken]
+    targetQ[np.arange(size), actionsTaken] = targets
+    return targetQ, tdErrors
+
+# Treina com minibatches amostrados da memória de repetição
+# Um sess.run para os alvos e um passo do otimizador por minibatch
+# syncTarget, se informada, é chamada depois de cada passo (atualização da rede alvo)
+def trainOnBatches(sess, inputState, Qoutputs, targetQOutputs, lossWeights, train_step, loss, memory, updates, batchSize, prioritized = False,
+                   target = None, doubleQ = False, syncTarget = None):
+    global forward_passes
+    total_loss = 0
+
+    for k in range(updates):
+        if prioritized:
+            indexes, batch, weights = memory.samplePrioritized(batchSize)
+        else:
+            indexes, batch = memory.sample(batchSize)
+            weights = np.ones(batchSize, dtype = np.float32)
+
+        targetQ, tdErrors = batchTargets(sess, inputState, Qoutputs, *batch, target = target, doubleQ = doubleQ)
+        _, t_loss = sess.run([train_step, loss], feed_dict={inputState: batch[0], targetQOutputs: targetQ, lossWeights: weights})
+        forward_passes += 2
+        if syncTarget:
+            syncTarget()
+
+        if prioritized:
+            memory.updatePriorities(indexes, tdErrors)
+
+        # A perda é a média do minibatch; multiplicamos pelo tamanho para somar como no modo por amostra
+        total_loss += t_loss * batchSize
+
+    return total_loss
+
+
+# trainMode = 'sample': uma atualização por transição (modo original)
+# trainMode = 'batch': minibatches de batchSize transições amostrados de uma memória de repetição com replaySize transições;
+# a cada iteração são feitas epochs * (transições novas / batchSize) atualizações
+# workers > 0: os jogos de cada iteração são gerados em paralelo por esse número de processos
+# vectorGames: todos os jogos da iteração são jogados juntos no ambiente vetorizado (uma passada da rede por rodada)
+# perfectOpponent: o oponente joga sempre um movimento ótimo do solucionador exato (solver.py)
+# keepCheckpoints: quantos checkpoints recentes ficam em MODEL_DIR (além do melhor)
+# telemetryFile: métricas de cada iteração em JSONL (padrão MODEL_DIR/telemetry.jsonl)
+# baselineGames: jogos por iteração contra um oponente fixo (aleatório), para a taxa de vitórias
+# targetUpdate > 0: rede alvo (só no modo batch) copiada da rede treinada a cada targetUpdate minibatches;
+# com targetTau, a rede alvo é aproximada depois de cada minibatch (alvo = tau * rede + (1 - tau) * alvo)
+# doubleQ: alvos do Double DQN (exige a rede alvo)
+def tainNetwork(trainMode = 'sample', batchSize = 64, epochs = 1, replaySize = 100000, replayFile = None, prioritized = False, workers = 0,
+                vectorGames = False, perfectOpponent = False, keepCheckpoints = 5, telemetryFile = None, baselineGames = 200,
+                targetUpdate = 0, targetTau = None, doubleQ = False):
     print()
 
+    useTarget = bool(targetUpdate or targetTau)
+    if useTarget and trainMode != 'batch':
+        raise ValueError("A rede alvo só é usada no modo batch")
+    if doubleQ and not useTarget:
+        raise ValueError("O Double DQN precisa da rede alvo (targetUpdate ou targetTau)")
+
     # Cria a rede
     inputState , Qoutputs, prediction = createNetwork()
+    networkVariables = tf.trainable_variables()
+
+    # Rede alvo: mesma arquitetura, variáveis em target/ que não entram nos checkpoints
+    target = None
+    if useTarget:
+        with tf.name_scope('target'):
+            frozenState, frozenQoutputs, _ = createNetwork()
+        target = (frozenState, frozenQoutputs)
+        targetVariables = tf.trainable_variables()[len(networkVariables):]
+        copyTarget = tf.group(*[frozen.assign(variable) for frozen, variable in zip(targetVariables, networkVariables)])
+        if targetTau:
+            updateTarget = tf.group(*[frozen.assign(targetTau * variable + (1 - targetTau) * frozen) for frozen, variable in zip(targetVariables, networkVariables)])
+        else:
+            updateTarget = copyTarget
 
     # Calcula a perda
     targetQOutputs = tf.placeholder("float",[None,actions])
-    loss =  tf.reduce_mean(tf.square(tf.subtract(targetQOutputs, Qoutputs)))
+
+    # Peso de cada transição na perda (amostragem priorizada); por padrão todas valem 1
+    lossWeights = tf.placeholder_with_default(tf.ones_like(targetQOutputs[:, 0]), [None])
+    loss =  tf.reduce_mean(tf.expand_dims(lossWeights, 1) * tf.square(tf.subtract(targetQOutputs, Qoutputs)))
 
     # Treina o modelo e minimiza a perda
     train_step = tf.train.AdamOptimizer(1e-4).minimize(loss)
@@ -160,22 +202,38 @@ def tainNetwork():
     sess = tf.InteractiveSession()
 
     # Salva a rede e inicializa as variáveis
-    saver = tf.train.Saver()
+    savedVariables = [variable for variable in tf.global_variables() if not variable.op.name.startswith('target/')]
+    saver = tf.train.Saver(savedVariables)
     sess.run(tf.global_variables_initializer())
 
+    # Checkpoints gravados em segundo plano; as gravações pendentes terminam antes de o programa sair
+    checkpoints = CheckpointManager(MODEL_DIR, savedVariables, keep = keepCheckpoints, weightsFile = os.path.join(MODEL_DIR, WEIGHTS_FILE))
+    atexit.register(checkpoints.flush)
+
     # Carrega o modelo salvo
     step = 0
     iterations = 0
 
-    checkpoint = tf.train.get_checkpoint_state("model")
-    if checkpoint and checkpoint.model_checkpoint_path:
-        s = saver.restore(sess,checkpoint.model_checkpoint_path)
-        print("Modelo carregado com sucesso:", checkpoint.model_checkpoint_path)
-        step = int(os.path.basename(checkpoint.model_checkpoint_path).split('-')[1])
+    resumed = checkpoints.restore(sess, saver)
+    if resumed:
+        print("Modelo carregado com sucesso:", resumed['path'])
+        step = resumed['step']
     else:
         print("Não foi possível carregar a rede")
     iterations += step
 
+    # A rede alvo começa igual à rede carregada
+    syncTarget = None
+    if useTarget:
+        sess.run(copyTarget)
+        targetUpdates = 0
+
+        def syncTarget():
+            nonlocal targetUpdates
+            targetUpdates += 1
+            if targetTau or targetUpdates % targetUpdate == 0:
+                sess.run(updateTarget)
+
     print(time.ctime())
 
     ## Define número máximo de correspondências para interação inicial
@@ -186,11 +244,45 @@ def tainNetwork():
     e_downrate = 0.9 / max_iterations
 
     e = epsilon
+    run_time = 0
+
+    # Retoma o epsilon e o tempo total do checkpoint carregado
+    if resumed and 'epsilon' in resumed:
+        e = resumed['epsilon']
+        run_time = resumed['runTime']
 
     print("Iteração Máxima = {}".format(max_iterations))
+    print("Modo de treino = {}".format(trainMode))
+    if useTarget:
+        print("Rede alvo = {}, Double DQN = {}".format('tau {}'.format(targetTau) if targetTau else 'cópia a cada {} minibatches'.format(targetUpdate), doubleQ))
+    print("Tabuleiro = {}x{}, {} em sequência, modelos em {}".format(rows, cols, winning_length, MODEL_DIR))
     print()
+
+    memory = ReplayMemory(replaySize, boardSize)
+    if trainMode == 'batch' and replayFile and os.path.exists(replayFile):
+        memory.load(replayFile)
+        print("Memória de repetição carregada com {} transições".format(len(memory)))
+
+    # Os processos de self-play e o diretório temporário com os pesos são liberados antes de o programa sair
+    pool = SelfPlayPool(workers) if workers > 0 else None
+    if pool:
+        atexit.register(pool.close)
+    env = VectorTicTacToe(number_of_matches_each_episode) if vectorGames else None
+
+    # Valores Q de um lote de estados (uma passada da rede)
+    def qFunction(states):
+        global forward_passes
+        forward_passes += 1
+        return sess.run(Qoutputs, feed_dict={inputState: states})
+
+    # Métricas de cada iteração
+    telemetry = Telemetry(telemetryFile or os.path.join(MODEL_DIR, TELEMETRY_FILE))
+
+    # Solucionador exato (só no 3x3): mede o acerto da rede contra o jogo perfeito a cada iteração
+    solver = Solver.loadOrBuild() if CLASSIC else None
+    if perfectOpponent and not solver:
+        raise ValueError("O oponente perfeito só existe no tabuleiro 3x3")
     
-    run_time = 0
     while "ticky" != "tacky":
         sys.stdout.flush()
         start_time = time.time()
@@ -198,62 +290,112 @@ def tainNetwork():
         global won_games
         global lost_games
         global draw_games
+        global forward_passes
 
         total_loss = 0
+        forward_passes = 0
+        telemetry.reset()
 
         epchos = 100
         GamesList = []
 
-        for i in range(episodes):
-            completeGame, victory = playaGame(e,sess,inputState, prediction,Qoutputs)
-            GamesList.append(completeGame)
-            
-
-        for k in range(epchos):
-            random.shuffle(GamesList)
-            for i in GamesList:
-                len_complete_game = len(i)
-                loop_in = 0
-                game_reward = 0
-                while loop_in < len_complete_game:
-                    j = i.pop()
-                    currentState = j[0]
-                    action = j[1][0]
-                    reward = j[2][0]
-                    nextState = j[3]
-
-                    ## Game e reward
-                    if loop_in == 0:
-                        game_reward = reward
-                    else:
-                        # Obter q valores para o próximo estado usando a rede
-                        nextQ = sess.run(Qoutputs,feed_dict={inputState:[nextState]})
-                        maxNextQ = np.max(nextQ)
-                        game_reward = GAMMA * ( maxNextQ )
-
-                    
-                    targetQ = sess.run(Qoutputs,feed_dict={inputState:[currentState]})
-
-                    # Uma vez que calculamos a recompensa para a ação em particular, devemos também adicionar a recompensa -1 
-                    # para todos os movimentos ilegais no valor q 
-                    for index,item in enumerate(currentState):
-                        if item != 0:
-                            targetQ[0,index] = -1
-
-                    targetQ[0,action] = game_reward
-
-                    loop_in += 1
-                    t_loss = 0
-
-                    
-                    t_loss=sess.run([train_step,Qoutputs,loss],feed_dict={inputState:[currentState], targetQOutputs:targetQ})
-                    total_loss += t_loss[2]
+        with telemetry.phase('selfPlay'):
+            transitions = None
+            if env:
+                transitions, (won, lost, draw) = env.selfPlay(qFunction, e, solver.opponentMoves if perfectOpponent else None)
+                won_games, lost_games, draw_games = won_games + won, lost_games + lost, draw_games + draw
+                if trainMode == 'sample':
+                    GamesList = env.toGameLists(transitions)
+            elif pool:
+                # Os processos de self-play recebem os pesos atuais antes de jogar
+                pool.syncWeights(sess.run(networkVariables))
+                GamesList, (won, lost, draw, passes) = pool.playGames(episodes, e, perfectOpponent)
+                won_games, lost_games, draw_games = won_games + won, lost_games + lost, draw_games + draw
+                forward_passes += passes
+            else:
+                for i in range(episodes):
+                    completeGame, victory = playaGame(e,sess,inputState, prediction,Qoutputs, solver if perfectOpponent else None)
+                    GamesList.append(completeGame)
+
+        # As transições são contadas antes do treino por amostra, que esvazia as listas de jogos
+        telemetry.count('games', episodes)
+        telemetry.count('transitions', len(transitions[0]) if transitions else sum(len(completeGame) for completeGame in GamesList))
+
+        with telemetry.phase('training'):
+            if trainMode == 'batch':
+                if transitions:
+                    newTransitions = len(memory.addBatch(*transitions[:5]))
+                else:
+                    newTransitions = sum(len(memory.addGame(completeGame)) for completeGame in GamesList)
+                updates = epochs * int(np.ceil(newTransitions / batchSize))
+                telemetry.count('updates', updates)
+                total_loss = trainOnBatches(sess, inputState, Qoutputs, targetQOutputs, lossWeights, train_step, loss, memory, updates, batchSize, prioritized,
+                                            target, doubleQ, syncTarget)
+            else:
+                for k in range(epchos):
+                    random.shuffle(GamesList)
+                    for i in GamesList:
+                        len_complete_game = len(i)
+                        loop_in = 0
+                        game_reward = 0
+                        while loop_in < len_complete_game:
+                            j = i.pop()
+                            currentState = j[0]
+                            action = j[1][0]
+                            reward = j[2][0]
+                            nextState = j[3]
+
+                            ## Game e reward
+                            if loop_in == 0:
+                                game_reward = reward
+                            else:
+                                # Obter q valores para o próximo estado usando a rede
+                                nextQ = sess.run(Qoutputs,feed_dict={inputState:[nextState]})
+                                forward_passes += 1
+                                maxNextQ = np.max(nextQ)
+                                game_reward = GAMMA * ( maxNextQ )
+
+
+                            targetQ = sess.run(Qoutputs,feed_dict={inputState:[currentState]})
+                            forward_passes += 1
+
+                            # Uma vez que calculamos a recompensa para a ação em particular, devemos também adicionar a recompensa -1 
+                            # para todos os movimentos ilegais no valor q 
+                            for index,item in enumerate(currentState):
+                                if item != 0:
+                                    targetQ[0,index] = -1
+
+                            targetQ[0,action] = game_reward
+
+                            loop_in += 1
+                            t_loss = 0
+
+
+                            t_loss=sess.run([train_step,Qoutputs,loss],feed_dict={inputState:[currentState], targetQOutputs:targetQ})
+                            total_loss += t_loss[2]
+                            forward_passes += 1
+                            telemetry.count('updates')
 
         iterations += 1
+        with telemetry.phase('evaluation'):
+            accuracy = solver.moveAccuracy(qFunction) if solver else None
+
+            # Taxa de vitórias contra o oponente fixo: movimentos aleatórios, sempre com o mesmo sorteio
+            baselineWinRate = None
+            if baselineGames:
+                baselineEnv = VectorTicTacToe(baselineGames, seed = 0)
+                _, (baselineWon, _, _) = baselineEnv.selfPlay(qFunction, 0, baselineEnv.randomLegal)
+                baselineWinRate = baselineWon / baselineGames
         time_diff = time.time()-start_time
         run_time += time_diff
-        print("Iteração {} completada com {} wins, {} losses {} draws, out of {} games played, e is {} \ncost is {} , current_time is {}, time taken is {} , total time = {} hours \n".format(iterations,
-        won_games,lost_games,draw_games,episodes,e*100,total_loss,time.ctime(),time_diff,(run_time)/3600))
+        print("Iteração {} completada com {} wins, {} losses {} draws, out of {} games played, e is {} \ncost is {} , move accuracy is {}% , current_time is {}, time taken is {} , total time = {} hours \n".format(iterations,
+        won_games,lost_games,draw_games,episodes,e*100,total_loss,'-' if accuracy is None else accuracy*100,time.ctime(),time_diff,(run_time)/3600))
+
+        # Metadados do checkpoint; a pontuação é o acerto contra o jogo perfeito ou, sem o solver, a taxa de vitórias
+        metadata = {'won': won_games, 'lost': lost_games, 'draw': draw_games, 'episodes': episodes,
+                    'loss': float(total_loss), 'accuracy': accuracy, 'baselineWinRate': baselineWinRate,
+                    'score': accuracy if accuracy is not None else won_games / episodes,
+                    'iterationTime': time_diff, 'runTime': run_time, 'wallTime': time.time()}
         start_time = time.time()
         total_loss = 0
         won_games = 0
@@ -265,16 +407,27 @@ def tainNetwork():
         else:
              e = random.choice([0.1,0.05,0.06,0.07,0.15,0.03,0.20,0.25,0.5,0.4])
 
-        saver.save(sess, "./model/model.ckpt",global_step=iterations)
+        # O epsilon gravado já é o da próxima iteração
+        metadata['epsilon'] = e
+        with telemetry.phase('checkpoint'):
+            checkpoints.save(sess, iterations, metadata)
+            if trainMode == 'batch' and replayFile:
+                memory.save(replayFile)
+
+        telemetry.count('forwardPasses', forward_passes)
+        telemetry.record(iterations, replaySize = len(memory) if trainMode == 'batch' else 0, **metadata)
 
 
 
 
 # Joga um jogo e retorna uma lista com todos os estados, ações e recompensa final.
-def playaGame(e,sess,inputState, prediction, Qoutputs):
+# O tabuleiro é um Board (bitboard.py) e a entrada da rede é escrita sempre no mesmo buffer
+# Com um solver (solver.py), o oponente joga sempre um movimento ótimo
+def playaGame(e,sess,inputState, prediction, Qoutputs, solver = None):
     global won_games
     global lost_games
     global draw_games
+    global forward_passes
 
     win_reward = 10
     loss_reward = -1
@@ -282,15 +435,18 @@ def playaGame(e,sess,inputState, prediction, Qoutputs):
 
     ## Cria o objeto de memória de jogo inteiro que contém as memórias para o jogo e um tabuleiro vazio
     completeGameMemory = []
-    myList = np.array([0]*(rows*cols)).reshape(3,3)
+    board = Board()
+    inputBuffer = np.zeros((1, boardSize), dtype = np.float32)
 
     turn = random.choice([1,-1])
 
     if(turn == -1):
-        initial_index = random.choice(range(9))
-        best_index, _= sess.run([prediction,Qoutputs], feed_dict={inputState : [np.array(np.copy(myList).reshape(-1))]})
+        initial_index = random.choice(range(boardSize))
+        board.toInput(inputBuffer[0])
+        best_index, _= sess.run([prediction,Qoutputs], feed_dict={inputState : inputBuffer})
+        forward_passes += 1
         initial_index = random.choice([best_index,initial_index,best_index])
-        myList[int(initial_index/3),initial_index%3] = -1
+        board.play(initial_index, -1)
         turn = turn * -1
 
     while(True):
@@ -298,14 +454,8 @@ def playaGame(e,sess,inputState, prediction, Qoutputs):
         ## Criar uma memória que mantenha o estado inicial atual, a ação tomada, a recompensa recebida, o próximo estado
         memory = []
 
-        ## Criar uma cópia do board que é linear
-        temp_copy = np.array(np.copy(myList).reshape(-1))
-
         ## Buscar todos os índices que estão livres ou zero para que eles possam ser usados para jogar o próximo movimento
-        zero_indexes = []
-        for index,item in enumerate(temp_copy):
-            if item == 0:
-                zero_indexes.append(index)
+        zero_indexes = board.legalMoves()
 
         if len(zero_indexes) == 0:
             reward = draw_reward
@@ -316,101 +466,88 @@ def playaGame(e,sess,inputState, prediction, Qoutputs):
         selectedRandomIndex = random.choice(zero_indexes)
 
         ## Calcular a previsão da rede que pode ser usada posteriormente como uma ação com alguma probabilidade
-        pred, _ = sess.run([prediction,Qoutputs], feed_dict={inputState : [temp_copy]})
-
-        ## Como a rede pode ser confusa e imprecisa, verifique se a previsão está correta primeiro.
-        isFalsePrediction = False if temp_copy[pred] == 0 else True
+        board.toInput(inputBuffer[0])
+        pred, _ = sess.run([prediction,Qoutputs], feed_dict={inputState : inputBuffer})
+        forward_passes += 1
 
         ## Vamos adicionar o estado inicial à memória atual
-        memory.append(np.copy(myList).reshape(-1))
+        memory.append(board.toArray())
 
         ## Vamos escolher uma ação com alguma probabilidade e exploração
         if random.random() > e: 
             action = pred
         else: 
-            random_action = random.choice(range(9))
             action = selectedRandomIndex
 
         memory.append([action])
 
+        ## Como a rede pode ser confusa e imprecisa, uma previsão em casa ocupada perde o jogo
         if action not in zero_indexes:
             reward = loss_reward
             memory.append([reward])
-            memory.append(np.copy(myList.reshape(-1)))
+            memory.append(board.toArray())
             completeGameMemory.append(memory)
             lost_games +=1
             break
 
         ## Atualizar o board com a ação tomada
-        myList[int(action/game_rows),action%game_cols] = 1
+        board.play(action, 1)
 
         ## Agora calcule a recompensa.
         reward = 0
 
-        ## Se escolhermos uma ação inválida, não recebemos nenhuma recompensa e o oponente ganha
-        if isFalsePrediction == True and action == pred:
-            reward = loss_reward
-            memory.append([reward])
-            memory.append(np.copy(myList.reshape(-1)))
-            completeGameMemory.append(memory)
-            lost_games +=1
-            break
-
         ## Se depois de jogarmos o nosso jogo o jogo estiver completo, então merecemos uma recompensa e é o estado final
-        if(isGameOver(myList)):
+        if board.winsWith(1, action):
             reward = win_reward
             memory.append([reward])
-            memory.append(np.copy(myList.reshape(-1)))
+            memory.append(board.toArray())
             completeGameMemory.append(memory)
             won_games +=1
             break
 
-
-
-        temp_copy_inverse = np.array(np.copy(InverseBoard(myList)).reshape(-1))
-        temp_copy = np.array(np.copy(myList).reshape(-1))
-        zero_indexes = []
-        for index,item in enumerate(temp_copy):
-            if item == 0:
-                zero_indexes.append(index)
+        zero_indexes = board.legalMoves()
 
         if len(zero_indexes) == 0:
             reward = draw_reward
             memory.append([reward])
-            memory.append(np.copy(myList.reshape(-1)))
+            memory.append(board.toArray())
             completeGameMemory.append(memory)
             draw_games+=1
             break
 
+        ## Jogada do oponente, com a previsão da rede no tabuleiro invertido
         selectedRandomIndex = random.choice(zero_indexes)
-        pred, _ = sess.run([prediction,Qoutputs], feed_dict={inputState : [temp_copy_inverse]})
-        isFalsePrediction = False if temp_copy[pred] == 0 else True
+        board.toInverseInput(inputBuffer[0])
+        pred, _ = sess.run([prediction,Qoutputs], feed_dict={inputState : inputBuffer})
+        forward_passes += 1
+        isFalsePrediction = not board.isEmpty(pred)
 
         action = None
 
-        if(isFalsePrediction == True):
+        if solver:
+            action = solver.bestMove(board.o, board.x)
+        elif(isFalsePrediction == True):
             action = random.choice([selectedRandomIndex])
         else:
             action = random.choice([selectedRandomIndex,pred,pred,pred,pred])
 
-        temp_copy2 = np.copy(myList).reshape(-1)
-        if temp_copy2[action] != 0:
-            print("Erro ",temp_copy2 , action)
+        if not board.isEmpty(action):
+            print("Erro ",board.toArray() , action)
             return
 
-        myList[int(action/game_rows),action%game_cols] = -1
+        board.play(action, -1)
 
-        if isGameOver(myList) == True:
+        if board.winsWith(-1, action):
             reward = loss_reward
             memory.append([reward])
-            memory.append(np.copy(myList.reshape(-1)))
+            memory.append(board.toArray())
             completeGameMemory.append(memory)
             lost_games +=1
             break
 
         ## Se ninguém ganhou e o jogo ainda não terminou, então vamos continuar o jogo
         memory.append([0])
-        memory.append(np.copy(myList.reshape(-1)))
+        memory.append(board.toArray())
 
         completeGameMemory.append(memory)
 
@@ -419,6 +556,27 @@ def playaGame(e,sess,inputState, prediction, Qoutputs):
 
 
 if __name__ == "__main__":
-    tainNetwork()
+    parser = argparse.ArgumentParser(description = 'Treina a rede do Tic Tac Toe com aprendizado Q')
+    parser.add_argument('--train-mode', choices = ['sample', 'batch'], default = 'sample',
+                        help = 'sample: uma atualização por transição; batch: minibatches vetorizados')
+    parser.add_argument('--batch-size', type = int, default = 64, help = 'Transições por minibatch (modo batch)')
+    parser.add_argument('--epochs', type = int, default = 1, help = 'Atualizações por iteração, em múltiplos das transições novas (modo batch)')
+    parser.add_argument('--replay-size', type = int, default = 100000, help = 'Capacidade da memória de repetição (modo batch)')
+    parser.add_argument('--replay-file', default = None, help = 'Arquivo .npz onde a memória de repetição é carregada e gravada')
+    parser.add_argument('--prioritized', action = 'store_true', help = 'Amostragem priorizada pelo erro TD')
+    parser.add_argument('--workers', type = int, default = 0, help = 'Processos de self-play em paralelo (0 = no próprio processo de treino)')
+    parser.add_argument('--vector-games', action = 'store_true', help = 'Joga todos os jogos da iteração juntos no ambiente vetorizado')
+    parser.add_argument('--perfect-opponent', action = 'store_true', help = 'O oponente joga sempre um movimento ótimo')
+    parser.add_argument('--keep-checkpoints', type = int, default = 5, help = 'Checkpoints recentes mantidos, além do melhor')
+    parser.add_argument('--telemetry-file', default = None, help = 'Arquivo JSONL com as métricas de cada iteração (padrão: <diretório do modelo>/telemetry.jsonl)')
+    parser.add_argument('--baseline-games', type = int, default = 200, help = 'Jogos por iteração contra o oponente aleatório fixo (0 desliga)')
+    parser.add_argument('--target-update', type = int, default = 0, help = 'Rede alvo copiada a cada N minibatches (modo batch; 0 desliga)')
+    parser.add_argument('--target-tau', type = float, default = None, help = 'Rede alvo aproximada a cada minibatch com esse fator (Polyak)')
+    parser.add_argument('--double-q', action = 'store_true', help = 'Alvos do Double DQN (exige a rede alvo)')
+    args = parser.parse_args()
+
+    tainNetwork(args.train_mode, args.batch_size, args.epochs, args.replay_size, args.replay_file, args.prioritized, args.workers,
+                args.vector_games, args.perfect_opponent, args.keep_checkpoints, args.telemetry_file, args.baseline_games,
+                args.target_update, args.target_tau, args.double_q)
 
     
@@ -0,0 +1,43 @@
+# Configuração do jogo: tamanho do tabuleiro e quantas peças em sequência vencem
+# O padrão é o Tic Tac Toe 3x3. Ex.: GAME_ROWS=4 para o 4x4, ou
+# GAME_ROWS=15 WINNING_LENGTH=5 para um jogo no estilo Gomoku.
+
+# Imports
+import os
+import numpy as np
+
+# Variáveis
+rows = int(os.environ.get('GAME_ROWS', '3'))
+cols = int(os.environ.get('GAME_COLS', str(rows)))
+winning_length = int(os.environ.get('WINNING_LENGTH', str(min(rows, cols))))
+boardSize = rows * cols
+
+# Tipo das ações (a casa jogada): o menor inteiro com sinal que guarda todas as casas (int8 só até 128 casas)
+ACTION_DTYPE = np.min_scalar_type(-boardSize)
+
+# O tabuleiro clássico (3x3, três em sequência) é o único resolvido pelo solver.py
+CLASSIC = (rows, cols, winning_length) == (3, 3, 3)
+
+# Cada variante tem o seu diretório de modelos; o 3x3 continua em model/
+MODEL_DIR = 'model' if CLASSIC else 'model_{}x{}_{}'.format(rows, cols, winning_length)
+
+
+# Função para listar as casas de todas as sequências de tamanho length (horizontais, verticais e diagonais)
+def lineIndexes(rows, cols, length):
+    lines = []
+    for r in range(rows):
+        for c in range(cols):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_r, end_c = r + dr * (length - 1), c + dc * (length - 1)
+                if 0 <= end_r < rows and 0 <= end_c < cols:
+                    lines.append([(r + dr * i) * cols + (c + dc * i) for i in range(length)])
+    return np.array(lines, dtype = np.intp).reshape(-1, length)
+
+# LINE_INDEXES[l]: casas da sequência l
+LINE_INDEXES = lineIndexes(rows, cols, winning_length)
+
+# LINES_THROUGH[i]: sequências que passam pela casa i (só elas mudam quando a casa i é jogada)
+LINES_THROUGH = [np.flatnonzero((LINE_INDEXES == i).any(axis = 1)) for i in range(boardSize)]
+
+# Mesma informação como tabela (boardSize, máximo de sequências por casa), completada repetindo a primeira sequência
+LINES_THROUGH_TABLE = np.array([np.resize(lines, max(map(len, LINES_THROUGH))) for lines in LINES_THROUGH], dtype = np.intp)
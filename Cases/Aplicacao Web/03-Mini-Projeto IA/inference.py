@@ -0,0 +1,153 @@
+# Inferência da rede sem o tensorflow
+# Os pesos das quatro camadas densas (9 -> 750 -> 750 -> 750 -> 9 no 3x3) são exportados do último
+# checkpoint para um .npz (MODEL_DIR/weights.npz, gravado também pelo treino a cada checkpoint) e a
+# rede é calculada com NumPy. O tensorflow só é importado para exportar a partir de um checkpoint.
+# MODEL_DIR/weights.npy tem os mesmos pesos em float32, em um único registro que pode ser mapeado
+# em memória e compartilhado por vários processos (asgi_app.py).
+
+# Imports
+import os
+import argparse
+import numpy as np
+from game_config import MODEL_DIR, boardSize
+
+# Arquivos de pesos, ao lado dos checkpoints
+WEIGHTS_FILE = 'weights.npz'
+FLAT_WEIGHTS_FILE = 'weights.npy'
+
+# Tabuleiros calculados por vez nas avaliações em lote (limita a memória das camadas intermediárias)
+CHUNK_SIZE = 4096
+
+# Nomes das variáveis de createNetwork no checkpoint: pesos e bias de cada camada, em ordem
+LAYER_VARIABLES = ['Variable'] + ['Variable_{}'.format(i) for i in range(1, 8)]
+
+
+# Grava os pesos (lista na ordem de LAYER_VARIABLES) com o nome do checkpoint de origem
+# float16 reduz o arquivo à metade; a rede é calculada em float32 de qualquer forma
+def saveWeights(path, layers, checkpoint = '', dtype = np.float32):
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, *[np.asarray(layer, dtype = dtype) for layer in layers], checkpoint = np.array(checkpoint))
+    os.replace(temporary, path)
+
+# Grava os pesos em float32 como um único registro .npy (um campo por camada e o nome do checkpoint)
+def saveFlatWeights(path, layers, checkpoint = ''):
+    layers = [np.asarray(layer, dtype = np.float32) for layer in layers]
+    dtype = np.dtype([('arr_{}'.format(i), np.float32, layer.shape) for i, layer in enumerate(layers)] + [('checkpoint', 'U64')])
+    record = np.zeros((), dtype = dtype)
+    for i, layer in enumerate(layers):
+        record['arr_{}'.format(i)] = layer
+    record['checkpoint'] = checkpoint
+
+    # O arquivo antigo continua válido para quem ainda o tem mapeado
+    temporary = path + '.tmp.npy'
+    np.save(temporary, record)
+    os.replace(temporary, path)
+
+# Nome do último checkpoint de directory (ex.: model.ckpt-120), lido do arquivo checkpoint sem o tensorflow
+def latestCheckpoint(directory = MODEL_DIR):
+    try:
+        with open(os.path.join(directory, 'checkpoint')) as f:
+            for line in f:
+                if line.startswith('model_checkpoint_path:'):
+                    return os.path.basename(line.split(':', 1)[1].strip().strip('"'))
+    except OSError:
+        pass
+    return None
+
+# Exporta os pesos do último checkpoint de directory e retorna o caminho do arquivo
+def exportWeights(directory = MODEL_DIR, path = None, dtype = np.float32):
+    import tensorflow as tf
+
+    checkpoint = tf.train.get_checkpoint_state(directory)
+    if not checkpoint or not checkpoint.model_checkpoint_path:
+        raise FileNotFoundError("Nenhum checkpoint em {}".format(directory))
+
+    reader = tf.train.NewCheckpointReader(checkpoint.model_checkpoint_path)
+    path = path or os.path.join(directory, WEIGHTS_FILE)
+    saveWeights(path, [reader.get_tensor(name) for name in LAYER_VARIABLES], os.path.basename(checkpoint.model_checkpoint_path), dtype)
+    return path
+
+
+class QNetwork:
+
+    def __init__(self, layers, checkpoint = ''):
+        layers = [np.ascontiguousarray(layer, dtype = np.float32) for layer in layers]
+        self.layers = layers
+        self.hidden = list(zip(layers[0:6:2], layers[1:6:2]))
+        self.output = (layers[6], layers[7])
+        self.checkpoint = checkpoint
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls([data['arr_{}'.format(i)] for i in range(len(LAYER_VARIABLES))], str(data['checkpoint']))
+
+    # Mapeia em memória um arquivo de saveFlatWeights; as camadas são visões do arquivo, sem cópia
+    @classmethod
+    def loadFlat(cls, path):
+        record = np.load(path, mmap_mode = 'r')
+        return cls([record['arr_{}'.format(i)] for i in range(len(LAYER_VARIABLES))], str(record['checkpoint']))
+
+    # Carrega os pesos do último checkpoint de directory, exportando-os se o arquivo de pesos
+    # ainda não existir ou for de outro checkpoint; retorna None se não houver modelo
+    # Com export = False o tensorflow nunca é importado: sem o arquivo de pesos do último checkpoint, retorna None
+    @classmethod
+    def fromModelDir(cls, directory = MODEL_DIR, export = True):
+        path = os.path.join(directory, WEIGHTS_FILE)
+        latest = latestCheckpoint(directory)
+        network = cls.load(path) if os.path.exists(path) else None
+        if latest and (network is None or network.checkpoint != latest):
+            network = cls.load(exportWeights(directory, path)) if export else None
+        return network
+
+    # Valores Q de tabuleiros (N, boardSize) com 1, -1 e 0
+    def q(self, boards):
+        h = np.asarray(boards, dtype = np.float32)
+        for w, b in self.hidden:
+            h = np.maximum(h @ w + b, 0)
+        w, b = self.output
+        return h @ w + b
+
+    # Movimento de maior valor Q só entre as casas livres (-1 nos tabuleiros cheios) e os valores Q de cada tabuleiro
+    def bestLegalMoves(self, boards):
+        boards = np.asarray(boards)
+        q = np.zeros(boards.shape, dtype = np.float32)
+        for start in range(0, len(boards), CHUNK_SIZE):
+            q[start:start + CHUNK_SIZE] = self.q(boards[start:start + CHUNK_SIZE])
+
+        empty = boards == 0
+        moves = np.argmax(np.where(empty, q, -np.inf), axis = 1)
+        moves[~empty.any(axis = 1)] = -1
+        return moves, q
+
+
+# Tabuleiros de uma avaliação em lote: lista JSON de tabuleiros ou bytes int8 (boardSize por tabuleiro)
+# Valores diferentes de 1, -1 e 0, tamanhos errados ou mais de limit tabuleiros geram ValueError
+def decodeBoards(payload, binary = False, limit = None):
+    boards = np.frombuffer(payload, dtype = np.int8) if binary else np.asarray(payload)
+    if boards.size % boardSize or (boards.ndim > 1 and boards.shape[-1] != boardSize):
+        raise ValueError("Cada tabuleiro deve ter {} casas".format(boardSize))
+    if not np.isin(boards, (-1, 0, 1)).all():
+        raise ValueError("As casas devem ser 1, -1 ou 0")
+    boards = boards.astype(np.int8).reshape(-1, boardSize)
+    if limit and len(boards) > limit:
+        raise ValueError("No máximo {} tabuleiros por requisição".format(limit))
+    return boards
+
+# Resposta de uma avaliação em lote: o melhor movimento legal de cada tabuleiro e, se pedidos, os valores Q
+def batchResult(network, boards, withQ = False):
+    moves, q = network.bestLegalMoves(boards)
+    result = {'moves': moves.tolist(), 'checkpoint': network.checkpoint}
+    if withQ:
+        result['q'] = q.tolist()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Exporta os pesos do último checkpoint para a inferência com NumPy')
+    parser.add_argument('--model-dir', default = MODEL_DIR)
+    parser.add_argument('--output', default = None, help = 'Arquivo .npz (padrão: <diretório do modelo>/weights.npz)')
+    parser.add_argument('--float16', action = 'store_true', help = 'Grava os pesos em float16')
+    args = parser.parse_args()
+
+    print("Pesos exportados em", exportWeights(args.model_dir, args.output, np.float16 if args.float16 else np.float32))
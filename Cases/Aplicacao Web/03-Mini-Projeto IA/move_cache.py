@@ -0,0 +1,62 @@
+# Cache do movimento da rede em todos os tabuleiros em que a IA (1) pode jogar
+# A tabela tem uma entrada por índice na base 3 do tabuleiro (3^9 = 19683 no 3x3, um int8 cada).
+# A rede é calculada uma vez em todos os tabuleiros jogáveis (4520 no 3x3) e a tabela guarda o mesmo
+# movimento de QNetwork.bestLegalMoves: a casa livre de maior valor Q. A rede não é simétrica, então cada
+# tabuleiro é calculado na sua própria orientação, e não levado de uma posição simétrica.
+# Depois disso, cada requisição é uma consulta à tabela. O cache vale para um checkpoint e é recriado quando os pesos mudam.
+
+# Imports
+import numpy as np
+from game_config import boardSize, winning_length, LINE_INDEXES
+
+# Só tabuleiros pequenos o bastante para listar todos os tabuleiros
+ENABLED = 3 ** boardSize <= 1 << 20
+
+# Peso de cada casa no índice
+POWERS = 3 ** np.arange(boardSize)
+
+
+# Índice na base 3 de tabuleiros (N, boardSize): casa vazia 0, X (1) 1 e O (-1) 2
+def boardIndexes(boards):
+    boards = np.asarray(boards)
+    return ((boards == 1).astype(np.int64) + 2 * (boards == -1)) @ POWERS
+
+if ENABLED:
+
+    # BASE3[m]: índice das casas m marcadas com 1, para calcular o índice de um Board direto dos bitboards
+    BASE3 = ((np.arange(1 << boardSize)[:, None] >> np.arange(boardSize)) & 1) @ POWERS
+
+    # ALL_BOARDS[i]: tabuleiro de índice i
+    digits = (np.arange(3 ** boardSize)[:, None] // POWERS) % 3
+    ALL_BOARDS = np.where(digits == 2, -1, digits).astype(np.int8)
+
+
+class MoveCache:
+
+    # network: QNetwork (inference.py) do checkpoint
+    def __init__(self, network):
+        self.checkpoint = network.checkpoint
+        self.table = np.full(3 ** boardSize, -1, dtype = np.int8)
+
+        # Tabuleiros em que a IA joga: o mesmo número de peças ou uma a menos que o humano, sem vencedor e com casas livres
+        counts = (ALL_BOARDS == -1).sum(axis = 1) - (ALL_BOARDS == 1).sum(axis = 1)
+        sums = ALL_BOARDS[:, LINE_INDEXES].sum(axis = 2)
+        playable = ((counts == 0) | (counts == 1)) & ~(np.abs(sums) == winning_length).any(axis = 1) & (ALL_BOARDS == 0).any(axis = 1)
+        indexes = np.flatnonzero(playable)
+
+        self.table[indexes] = network.bestLegalMoves(ALL_BOARDS[indexes])[0]
+        self.positions = len(indexes)
+
+    # Movimento de um Board (bitboard.py), ou None se o tabuleiro não estiver na tabela
+    def move(self, board):
+        move = self.table[BASE3[board.x] + 2 * BASE3[board.o]]
+        return int(move) if move >= 0 else None
+
+
+# Rede e cache de movimentos de um checkpoint; são trocados juntos (app.py e asgi_app.py)
+class Model:
+
+    def __init__(self, network = None):
+        self.network = network
+        self.checkpoint = network.checkpoint if network else None
+        self.moveCache = MoveCache(network) if network and ENABLED else None
@@ -0,0 +1,183 @@
+# Memória de repetição (experience replay) com capacidade fixa, guardada em arrays pré-alocados
+# Os tabuleiros ficam em int8 (-1, 0, 1), as ações no menor inteiro que guarda boardSize casas
+# (int8 no 3x3, int16 no 15x15) e as recompensas em float32.
+# Quando a memória enche, as transições mais antigas são sobrescritas (buffer circular).
+# Na amostragem priorizada, as prioridades^alpha ficam em uma árvore de somas: amostrar e atualizar
+# um minibatch custa O(batch * log(capacidade)), e não O(capacidade).
+
+# Imports
+import os
+import numpy as np
+
+
+# Árvore de somas sobre capacity folhas: cada nó guarda a soma dos dois filhos e a raiz (nó 1) o total
+class SumTree:
+
+    def __init__(self, capacity):
+        self.leaves = 1 << max(capacity - 1, 0).bit_length()
+        self.tree = np.zeros(2 * self.leaves, dtype = np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    # Valores das folhas indexes
+    def get(self, indexes):
+        return self.tree[self.leaves + np.asarray(indexes)]
+
+    # Troca o valor das folhas indexes e refaz as somas dos seus ancestrais, um nível por vez
+    def update(self, indexes, values):
+        nodes = self.leaves + np.asarray(indexes)
+        self.tree[nodes] = values
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+
+    # Refaz a árvore inteira a partir das folhas (ex.: depois de carregar uma memória)
+    def rebuild(self, values):
+        self.tree[:] = 0
+        self.tree[self.leaves:self.leaves + len(values)] = values
+        for level in range(self.leaves.bit_length() - 2, -1, -1):
+            nodes = np.arange(1 << level, 2 << level)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    # Folha de cada valor acumulado em [0, total): desce pela esquerda ou pela direita em cada nível
+    def find(self, values):
+        values = np.array(values, dtype = np.float64)
+        nodes = np.ones(len(values), dtype = np.int64)
+        while nodes[0] < self.leaves:
+            left = self.tree[2 * nodes]
+            right = values >= left
+            values -= np.where(right, left, 0)
+            nodes = 2 * nodes + right
+        return nodes - self.leaves
+
+
+class ReplayMemory:
+
+    def __init__(self, capacity, boardSize, alpha = 0.6, epsilon = 1e-3):
+        self.capacity = capacity
+        self.boardSize = boardSize
+        self.alpha = alpha
+        self.epsilon = epsilon
+
+        self.states = np.zeros((capacity, boardSize), dtype = np.int8)
+        self.nextStates = np.zeros((capacity, boardSize), dtype = np.int8)
+        self.actions = np.zeros(capacity, dtype = np.min_scalar_type(-boardSize))
+        self.rewards = np.zeros(capacity, dtype = np.float32)
+        self.dones = np.zeros(capacity, dtype = bool)
+        self.priorities = np.zeros(capacity, dtype = np.float32)
+        self.sumTree = SumTree(capacity)
+        self.maxPriority = 1.0
+
+        self.position = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    # Adiciona um bloco de transições de uma vez
+    def addBatch(self, states, actions, rewards, nextStates, dones):
+        count = len(states)
+        indexes = (self.position + np.arange(count)) % self.capacity
+
+        self.states[indexes] = states
+        self.nextStates[indexes] = nextStates
+        self.actions[indexes] = actions
+        self.rewards[indexes] = rewards
+        self.dones[indexes] = dones
+
+        # Transições novas recebem a maior prioridade já vista para serem amostradas ao menos uma vez
+        self.priorities[indexes] = self.maxPriority
+        self.sumTree.update(indexes, self.maxPriority ** self.alpha)
+
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        return indexes
+
+    # Adiciona um jogo no formato de playaGame: [estado, [ação], [recompensa], próximo estado] por jogada
+    # A última jogada do jogo é a transição terminal
+    def addGame(self, completeGame):
+        if not completeGame:
+            return np.zeros(0, dtype = np.int64)
+
+        states = np.array([memory[0] for memory in completeGame]).reshape(-1, self.boardSize)
+        actions = np.array([memory[1][0] for memory in completeGame])
+        rewards = np.array([memory[2][0] for memory in completeGame])
+        nextStates = np.array([memory[3] for memory in completeGame]).reshape(-1, self.boardSize)
+        dones = np.arange(len(completeGame)) == len(completeGame) - 1
+
+        return self.addBatch(states, actions, rewards, nextStates, dones)
+
+    # Amostra uniforme: retorna os índices e os arrays do minibatch
+    def sample(self, batchSize):
+        indexes = np.random.randint(0, self.size, batchSize)
+        return indexes, self.get(indexes)
+
+    # Amostra priorizada (proporcional a prioridade^alpha), com um valor sorteado em cada uma de batchSize faixas
+    # da soma total. Retorna também os pesos de importância, normalizados pelo maior peso do minibatch
+    def samplePrioritized(self, batchSize, beta = 0.4):
+        total = self.sumTree.total()
+        values = (np.arange(batchSize) + np.random.random(batchSize)) * (total / batchSize)
+        indexes = np.minimum(self.sumTree.find(values), self.size - 1)
+
+        probabilities = self.sumTree.get(indexes) / total
+        weights = (self.size * probabilities) ** -beta
+        weights /= weights.max()
+
+        return indexes, self.get(indexes), weights.astype(np.float32)
+
+    # Atualiza as prioridades com o erro TD das transições amostradas
+    def updatePriorities(self, indexes, errors):
+        priorities = np.abs(errors) + self.epsilon
+        self.priorities[indexes] = priorities
+        self.sumTree.update(indexes, priorities.astype(np.float64) ** self.alpha)
+        self.maxPriority = max(self.maxPriority, float(priorities.max()))
+
+    # Arrays (estados, ações, recompensas, próximos estados, fim de jogo) prontos para a rede
+    def get(self, indexes):
+        return (self.states[indexes].astype(np.float32),
+                self.actions[indexes].astype(np.int64),
+                self.rewards[indexes],
+                self.nextStates[indexes].astype(np.float32),
+                self.dones[indexes])
+
+    # Índices das transições da mais antiga para a mais recente
+    def chronological(self):
+        if self.size < self.capacity:
+            return np.arange(self.size)
+        return (np.arange(self.capacity) + self.position) % self.capacity
+
+    # Grava a memória em um único arquivo .npz, em ordem cronológica
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+
+        order = self.chronological()
+        temporary = path + '.tmp.npz'
+        np.savez_compressed(temporary,
+                            states = self.states[order], nextStates = self.nextStates[order],
+                            actions = self.actions[order], rewards = self.rewards[order],
+                            dones = self.dones[order], priorities = self.priorities[order])
+        os.replace(temporary, path)
+
+    # Carrega uma memória gravada com save; se a capacidade for menor, ficam as transições mais recentes
+    def load(self, path):
+        with np.load(path) as data:
+            keep = slice(max(len(data['states']) - self.capacity, 0), None)
+
+            states = data['states'][keep]
+            count = len(states)
+            self.states[:count] = states
+            self.nextStates[:count] = data['nextStates'][keep]
+            self.actions[:count] = data['actions'][keep]
+            self.rewards[:count] = data['rewards'][keep]
+            self.dones[:count] = data['dones'][keep]
+            self.priorities[:count] = data['priorities'][keep]
+
+        self.size = count
+        self.position = count % self.capacity
+        self.sumTree.rebuild(self.priorities[:count].astype(np.float64) ** self.alpha)
+        self.maxPriority = float(self.priorities[:count].max()) if count else 1.0
+        return self
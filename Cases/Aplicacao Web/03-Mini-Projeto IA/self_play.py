@@ -0,0 +1,105 @@
+# Geração de jogos (self-play) em paralelo, com vários processos
+# Cada processo tem a sua própria cópia da rede (grafo e sessão do tensorflow) e recebe os pesos
+# atuais do processo de treino a cada iteração, por um arquivo .npz em um diretório temporário.
+
+# Imports
+import os
+import random
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+
+# Estado de cada processo de self-play (preenchido em initWorker)
+worker = {}
+
+
+# Inicializa um processo: cria a rede em uma sessão com uma única thread
+def initWorker():
+    import tensorflow as tf
+    import deep_reinforcement_learning as drl
+
+    inputState, Qoutputs, prediction = drl.createNetwork()
+    config = tf.ConfigProto(intra_op_parallelism_threads = 1, inter_op_parallelism_threads = 1)
+    sess = tf.Session(config = config)
+    sess.run(tf.global_variables_initializer())
+
+    worker.update(drl = drl, sess = sess, inputState = inputState, Qoutputs = Qoutputs, prediction = prediction,
+                  variables = tf.trainable_variables(), version = None)
+
+# Joga um lote de jogos com os pesos da versão pedida
+def playGames(task):
+    version, weightsFile, count, e, perfectOpponent, seed = task
+    drl = worker['drl']
+
+    # O solucionador exato só é carregado quando o oponente perfeito é pedido
+    if perfectOpponent and 'solver' not in worker:
+        from solver import Solver
+        worker['solver'] = Solver.loadOrBuild()
+    solver = worker['solver'] if perfectOpponent else None
+
+    # Recarrega os pesos só quando a versão muda
+    if worker['version'] != version:
+        with np.load(weightsFile) as weights:
+            for index, variable in enumerate(worker['variables']):
+                variable.load(weights['arr_{}'.format(index)], worker['sess'])
+        worker['version'] = version
+
+    random.seed(seed)
+    np.random.seed(seed % (2 ** 32))
+
+    drl.won_games = drl.lost_games = drl.draw_games = drl.forward_passes = 0
+    games = []
+    for i in range(count):
+        completeGame, victory = drl.playaGame(e, worker['sess'], worker['inputState'], worker['prediction'], worker['Qoutputs'], solver)
+        games.append(completeGame)
+
+    return games, (drl.won_games, drl.lost_games, drl.draw_games, drl.forward_passes)
+
+
+# Conjunto de processos de self-play usado pelo processo de treino
+class SelfPlayPool:
+
+    def __init__(self, workers, chunksPerWorker = 4):
+        self.workers = workers
+        self.chunksPerWorker = chunksPerWorker
+        self.version = 0
+        self.weightsFile = None
+        self.directory = tempfile.mkdtemp(prefix = 'self_play_')
+
+        # spawn: cada processo começa limpo e cria o seu próprio grafo do tensorflow
+        context = multiprocessing.get_context('spawn')
+        self.pool = context.Pool(workers, initializer = initWorker)
+
+    # Publica os pesos atuais para os processos (chamado a cada iteração de treino)
+    def syncWeights(self, weights):
+        self.version += 1
+        weightsFile = os.path.join(self.directory, 'weights-{}.npz'.format(self.version))
+        np.savez(weightsFile, *weights)
+
+        # Os processos só leem o arquivo da versão atual, então o anterior pode ser removido
+        if self.weightsFile:
+            os.remove(self.weightsFile)
+        self.weightsFile = weightsFile
+
+    # Distribui os jogos em lotes entre os processos e junta os resultados
+    # Retorna a lista de jogos e as contagens de vitórias, derrotas, empates e passadas da rede
+    def playGames(self, games, e, perfectOpponent = False):
+        chunks = min(games, self.workers * self.chunksPerWorker)
+        counts = [games // chunks + (1 if i < games % chunks else 0) for i in range(chunks)]
+        tasks = [(self.version, self.weightsFile, count, e, perfectOpponent, random.getrandbits(63)) for count in counts]
+
+        GamesList = []
+        won, lost, draw, passes = 0, 0, 0, 0
+        for chunkGames, (chunkWon, chunkLost, chunkDraw, chunkPasses) in self.pool.imap_unordered(playGames, tasks):
+            GamesList.extend(chunkGames)
+            won, lost, draw, passes = won + chunkWon, lost + chunkLost, draw + chunkDraw, passes + chunkPasses
+
+        return GamesList, (won, lost, draw, passes)
+
+    # Encerra os processos e apaga os pesos publicados; chamado ao sair do treino (atexit)
+    # terminate em vez de close: depois de um Ctrl+C os processos podem estar parados no meio de um lote
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        shutil.rmtree(self.directory, ignore_errors = True)
@@ -0,0 +1,139 @@
+# Solucionador exato do Tic Tac Toe (minimax/negamax com memoização)
+# A tabela de transposição guarda o valor de cada posição, reduzida pelas 8 simetrias do tabuleiro,
+# e é gravada em disco para ser calculada uma única vez.
+# As posições usam os bitboards de bitboard.py; x é sempre o jogador da vez.
+# Só o tabuleiro clássico (3x3, três em sequência) é resolvido (game_config.CLASSIC).
+
+# Imports
+import os
+import random
+import numpy as np
+from game_config import rows, cols, boardSize, CLASSIC
+from bitboard import Board, FULL, isWin, legalMoves, bits
+
+# Arquivo da tabela de transposição
+SOLVER_FILE = os.environ.get('SOLVER_FILE', 'solver.npz')
+
+# As 8 simetrias (rotações e reflexões) como permutações das casas
+grid = np.arange(boardSize).reshape(rows, cols)
+SYMMETRIES = [np.rot90(grid, k).reshape(-1) for k in range(4)] + [np.fliplr(np.rot90(grid, k)).reshape(-1) for k in range(4)]
+
+# TRANSFORMS[s][m]: máscara m depois da simetria s
+TRANSFORMS = [[sum(1 << i for i in range(boardSize) if m >> int(permutation[i]) & 1) for m in range(1 << boardSize)]
+              for permutation in SYMMETRIES] if CLASSIC else []
+
+
+# Chave canônica de uma posição: a menor entre as 8 simetrias
+def canonicalKey(x, o):
+    return min(transform[x] | transform[o] << boardSize for transform in TRANSFORMS)
+
+
+class Solver:
+
+    def __init__(self, table = None):
+        self.table = table if table is not None else {}
+
+    # Valor da posição para o jogador da vez: > 0 vitória, 0 empate, < 0 derrota
+    # Quanto mais casas livres ao final, maior o valor absoluto (vitórias rápidas e derrotas lentas)
+    def value(self, x, o):
+        key = canonicalKey(x, o)
+        result = self.table.get(key)
+        if result is None:
+            result = self.table[key] = self._solve(x, o)
+        return result
+
+    def _solve(self, x, o):
+        occupied = x | o
+        if isWin(o):
+            return -(len(legalMoves(occupied)) + 1)
+        if occupied == FULL:
+            return 0
+        return max(-self.value(o, x | 1 << move) for move in legalMoves(occupied))
+
+    # Valor de cada movimento legal para o jogador da vez
+    def moveValues(self, x, o):
+        return {move: -self.value(o, x | 1 << move) for move in legalMoves(x | o)}
+
+    # Todos os movimentos ótimos
+    def bestMoves(self, x, o):
+        values = self.moveValues(x, o)
+        best = max(values.values())
+        return [move for move, value in values.items() if value == best]
+
+    # Um movimento ótimo sorteado entre os empatados
+    def bestMove(self, x, o):
+        return random.choice(self.bestMoves(x, o))
+
+    # Movimento ótimo do oponente (-1) em cada tabuleiro (N, 9) do ponto de vista do agente
+    def opponentMoves(self, boards):
+        moves = np.zeros(len(boards), dtype = np.int64)
+        for i, board in enumerate(boards):
+            board = Board.fromArray(board)
+            moves[i] = self.bestMove(board.o, board.x)
+        return moves
+
+    # Resolve todas as posições de um jogo, começando pelo agente ou pelo oponente
+    def build(self):
+        self.value(0, 0)
+        for move in range(boardSize):
+            self.value(0, 1 << move)
+        return self
+
+    # Todas as posições não terminais em que o agente (x) joga, com a máscara dos movimentos ótimos
+    # Usadas para medir o acerto da rede contra o jogo perfeito
+    def evaluationSet(self):
+        if hasattr(self, '_evaluationSet'):
+            return self._evaluationSet
+
+        positions = set()
+        pending = [(0, 0)] + [(0, 1 << move) for move in range(boardSize)]
+        while pending:
+            x, o = pending.pop()
+            if (x, o) in positions or isWin(o) or x | o == FULL:
+                continue
+            positions.add((x, o))
+
+            # Cada movimento do agente seguido de cada resposta do oponente
+            for move in legalMoves(x | o):
+                after = x | 1 << move
+                if isWin(after):
+                    continue
+                for reply in legalMoves(after | o):
+                    pending.append((after, o | 1 << reply))
+
+        positions = sorted(positions)
+        boards = np.array([bits(x) - bits(o) for x, o in positions], dtype = np.float32)
+        optimal = np.zeros((len(positions), boardSize), dtype = bool)
+        for i, (x, o) in enumerate(positions):
+            optimal[i, self.bestMoves(x, o)] = True
+
+        self._evaluationSet = (boards, optimal)
+        return self._evaluationSet
+
+    # Fração das posições em que o movimento de maior valor Q da rede é ótimo
+    # qFunction recebe os estados (M, 9) e retorna os valores Q (M, 9)
+    def moveAccuracy(self, qFunction):
+        boards, optimal = self.evaluationSet()
+        moves = np.argmax(qFunction(boards), axis = 1)
+        return float(optimal[np.arange(len(moves)), moves].mean())
+
+    def save(self, path = SOLVER_FILE):
+        keys = np.fromiter(self.table.keys(), dtype = np.int64, count = len(self.table))
+        values = np.fromiter(self.table.values(), dtype = np.int8, count = len(self.table))
+        temporary = path + '.tmp.npz'
+        np.savez(temporary, keys = keys, values = values)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path = SOLVER_FILE):
+        with np.load(path) as data:
+            return cls(dict(zip(data['keys'].tolist(), data['values'].tolist())))
+
+    # Carrega a tabela do disco ou, na primeira vez, resolve o jogo inteiro e grava a tabela
+    @classmethod
+    def loadOrBuild(cls, path = SOLVER_FILE):
+        if os.path.exists(path):
+            return cls.load(path)
+        solver = cls().build()
+        solver.save(path)
+        return solver
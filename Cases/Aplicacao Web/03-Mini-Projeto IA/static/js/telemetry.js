@@ -0,0 +1,96 @@
+$(document).ready(function() {
+
+    // charts: title and the series (field of each record, or a function of the record)
+    var charts = [
+        { title: 'Jogos/s e transições/s (self-play)', series: [['gamesPerSecond', '#337ab7'], ['transitionsPerSecond', '#5cb85c']] },
+        { title: 'Passadas da rede/s e atualizações/s', series: [['forwardPassesPerSecond', '#337ab7'], ['updatesPerSecond', '#d9534f']] },
+        { title: 'Tempo por fase (s)', series: [[phase('selfPlay'), '#337ab7'], [phase('training'), '#d9534f'],
+                                               [phase('evaluation'), '#f0ad4e'], [phase('checkpoint'), '#777']] },
+        { title: 'Perda', series: [['loss', '#d9534f']] },
+        { title: 'Vitórias contra o aleatório e acerto', series: [['baselineWinRate', '#5cb85c'], ['accuracy', '#337ab7']] },
+        { title: 'Memória de repetição', series: [['replaySize', '#777']] }
+    ];
+
+    var width = 420;
+    var height = 180;
+    var padding = 30;
+    var records = [];
+    var last = null;
+
+    function phase(name) {
+        var f = function(record) { return record.phases[name]; };
+        f.label = name;
+        return f;
+    }
+
+    function value(record, field) {
+        return typeof field === 'function' ? field(record) : record[field];
+    }
+
+    function label(field) {
+        return typeof field === 'function' ? field.label : field;
+    }
+
+    // one svg with a polyline per series, scaled to the largest value
+    function drawChart(chart) {
+        var max = 0;
+        chart.series.forEach(function(serie) {
+            records.forEach(function(record) {
+                var v = value(record, serie[0]);
+                if (v !== null && v !== undefined && v > max) max = v;
+            });
+        });
+        max = max || 1;
+
+        var svg = '<svg width="' + width + '" height="' + height + '">';
+        svg += '<text x="4" y="12">' + max.toPrecision(3) + '</text><text x="4" y="' + (height - 4) + '">0</text>';
+        chart.series.forEach(function(serie, index) {
+            var points = [];
+            records.forEach(function(record, i) {
+                var v = value(record, serie[0]);
+                if (v === null || v === undefined) return;
+                var x = padding + (width - 2 * padding) * (records.length > 1 ? i / (records.length - 1) : 0);
+                var y = height - padding + (2 * padding - height) * v / max;
+                points.push(x.toFixed(1) + ',' + y.toFixed(1));
+            });
+            svg += '<polyline stroke="' + serie[1] + '" points="' + points.join(' ') + '"/>';
+            svg += '<text x="' + (padding + 110 * index) + '" y="' + (height - 8) + '" style="fill:' + serie[1] + '">' + label(serie[0]) + '</text>';
+        });
+        return '<div class="chart"><h4>' + chart.title + '</h4>' + svg + '</svg></div>';
+    }
+
+    function drawLatest(record) {
+        var rows = '';
+        $.each(record, function(key, v) {
+            if (key === 'phases') {
+                $.each(v, function(name, seconds) { rows += '<tr><td>phases.' + name + '</td><td>' + seconds.toFixed(3) + '</td></tr>'; });
+            } else {
+                rows += '<tr><td>' + key + '</td><td>' + (typeof v === 'number' && v % 1 !== 0 ? v.toFixed(3) : v) + '</td></tr>';
+            }
+        });
+        $('#latest').html(rows);
+    }
+
+    function draw() {
+        if (!records.length) return;
+        var record = records[records.length - 1];
+        $('#summary').text('Iteração ' + record.iteration + ', ' + records.length + ' iterações no arquivo, atualizado em ' + new Date(record.time * 1000).toLocaleTimeString());
+        $('#charts').html(charts.map(drawChart).join(''));
+        drawLatest(record);
+    }
+
+    // only the records after the last iteration are requested
+    function poll() {
+        $.getJSON('/api/telemetry', last === null ? {} : { since: last }, function(data) {
+            if (data.length) {
+                records = records.concat(data);
+                last = data[data.length - 1].iteration;
+                draw();
+            }
+        }).always(function() {
+            setTimeout(poll, 3000);
+        });
+    }
+
+    poll();
+});
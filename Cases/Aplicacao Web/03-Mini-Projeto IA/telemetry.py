@@ -0,0 +1,81 @@
+# Telemetria do treino: uma linha JSON por iteração (JSONL) com o tempo de cada fase,
+# contadores (jogos, transições, passadas da rede) e as taxas por segundo derivadas deles.
+# O arquivo pode ser acompanhado com telemetry_app.py.
+
+# Imports
+import os
+import json
+import time
+from contextlib import contextmanager
+
+# Arquivo padrão, ao lado dos checkpoints
+TELEMETRY_FILE = 'telemetry.jsonl'
+
+
+class Telemetry:
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+
+    # Mede o tempo de uma fase da iteração (ex.: selfPlay, training, evaluation, checkpoint)
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    # Grava a linha da iteração e recomeça a contagem
+    def record(self, iteration, **scalars):
+        elapsed = time.perf_counter() - self.started
+        selfPlay = self.phases.get('selfPlay', 0.0)
+        training = self.phases.get('training', 0.0)
+
+        record = {'iteration': iteration,
+                  'time': time.time(),
+                  'iterationTime': elapsed,
+                  'phases': dict(self.phases)}
+        record.update(self.counters)
+        record['gamesPerSecond'] = self.counters.get('games', 0) / selfPlay if selfPlay else None
+        record['transitionsPerSecond'] = self.counters.get('transitions', 0) / selfPlay if selfPlay else None
+        record['updatesPerSecond'] = self.counters.get('updates', 0) / training if training else None
+        record['forwardPassesPerSecond'] = self.counters.get('forwardPasses', 0) / elapsed if elapsed else None
+        record.update(scalars)
+
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+        self.reset()
+        return record
+
+
+# Lê as linhas gravadas (a partir da iteração since, se informada)
+def readTelemetry(path, since = None):
+    records = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+
+                    # Linha ainda sendo escrita pelo treino
+                    continue
+                if since is None or record['iteration'] > since:
+                    records.append(record)
+    except OSError:
+        pass
+    return records
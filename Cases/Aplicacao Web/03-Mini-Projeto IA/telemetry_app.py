@@ -0,0 +1,31 @@
+# Painel local da telemetria do treino (telemetry.jsonl gravado por deep_reinforcement_learning.py)
+# Não carrega o tensorflow: só lê o arquivo, e a página consulta as linhas novas a cada poucos segundos.
+
+# Imports
+import os
+import argparse
+from flask import Flask, jsonify, render_template, request
+from game_config import MODEL_DIR
+from telemetry import readTelemetry, TELEMETRY_FILE
+
+app = Flask(__name__)
+app.config['TELEMETRY_FILE'] = os.path.join(MODEL_DIR, TELEMETRY_FILE)
+
+@app.route('/')
+def index():
+    return render_template('telemetry.html')
+
+# Linhas gravadas depois da iteração since (todas, sem o parâmetro)
+@app.route('/api/telemetry')
+def telemetry_api():
+    since = request.args.get('since', type = int)
+    return jsonify(readTelemetry(app.config['TELEMETRY_FILE'], since))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Painel da telemetria do treino')
+    parser.add_argument('--file', default = app.config['TELEMETRY_FILE'], help = 'Arquivo JSONL da telemetria')
+    parser.add_argument('--port', type = int, default = 8081)
+    args = parser.parse_args()
+
+    app.config['TELEMETRY_FILE'] = args.file
+    app.run(host = '127.0.0.1', port = args.port)
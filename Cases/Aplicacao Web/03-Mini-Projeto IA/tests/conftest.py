@@ -0,0 +1,19 @@
+# Os testes importam os módulos do projeto a partir do diretório pai
+import os
+import sys
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from inference import QNetwork
+
+
+# Rede com pesos aleatórios (9 -> 64 -> 64 -> 64 -> 9)
+def randomNetwork(seed = 0, hidden = 64):
+    rng = np.random.default_rng(seed)
+    sizes = [9, hidden, hidden, hidden, 9]
+    layers = []
+    for inputs, outputs in zip(sizes[:-1], sizes[1:]):
+        layers += [rng.normal(0, 1, (inputs, outputs)), rng.normal(0, 0.1, outputs)]
+    return QNetwork(layers, 'model.ckpt-{}'.format(seed))
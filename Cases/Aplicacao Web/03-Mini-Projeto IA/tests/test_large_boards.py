@@ -0,0 +1,35 @@
+# Tabuleiros com mais de 127 casas: as ações não podem estourar o tipo inteiro
+# O game_config lê o tamanho do tabuleiro na importação, então o jogo roda em outro processo
+
+# Imports
+import os
+import sys
+import subprocess
+from conftest import PROJECT_DIR
+
+SCRIPT = '''
+import numpy as np
+from game_config import boardSize
+from vector_env import VectorTicTacToe
+from replay_buffer import ReplayMemory
+
+rng = np.random.default_rng(0)
+env = VectorTicTacToe(64, seed = 0)
+transitions, _ = env.selfPlay(lambda boards: rng.random((len(boards), boardSize)), 0.5)
+memory = ReplayMemory(100000, boardSize)
+memory.addBatch(*transitions[:5])
+
+actions = transitions[1]
+assert boardSize > 127 and actions.max() > 127, (boardSize, actions.max())
+assert ((actions >= 0) & (actions < boardSize)).all()
+assert ((memory.actions[:len(memory)] >= 0) & (memory.actions[:len(memory)] < boardSize)).all()
+assert (memory.get(np.arange(len(memory)))[1] == actions).all()
+for game in VectorTicTacToe.toGameLists(transitions):
+    for _, action, _, _ in game:
+        assert 0 <= action[0] < boardSize
+'''
+
+
+def test_actions_in_range_on_15x15():
+    environment = dict(os.environ, GAME_ROWS = '15', WINNING_LENGTH = '5')
+    subprocess.run([sys.executable, '-c', SCRIPT], cwd = PROJECT_DIR, env = environment, check = True)
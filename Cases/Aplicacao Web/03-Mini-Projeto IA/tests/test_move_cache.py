@@ -0,0 +1,19 @@
+# O cache de movimentos deve responder exatamente o que a rede responderia em cada tabuleiro
+
+# Imports
+import numpy as np
+from bitboard import Board
+from move_cache import MoveCache, ALL_BOARDS
+from conftest import randomNetwork
+
+
+def test_cache_matches_network_on_every_playable_board():
+    for seed in range(3):
+        network = randomNetwork(seed)
+        cache = MoveCache(network)
+        indexes = np.flatnonzero(cache.table >= 0)
+        assert len(indexes) == 4520
+
+        for board in ALL_BOARDS[indexes]:
+            expected = int(network.bestLegalMoves(board[None])[0][0])
+            assert cache.move(Board.fromArray(board)) == expected, board.tolist()
@@ -0,0 +1,85 @@
+# /api/ticky e /api/ticky/batch devem escolher o mesmo movimento para o mesmo tabuleiro
+
+# Imports
+import os
+import sys
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from inference import saveWeights
+from move_cache import ALL_BOARDS
+from conftest import randomNetwork
+
+
+# App Flask com uma rede aleatória em MODEL_DIR, sem o livro de aberturas e sem espera nos lotes
+@pytest.fixture(scope = 'module')
+def client(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('ticky')
+    network = randomNetwork(7)
+    os.makedirs(directory / 'model')
+    saveWeights(str(directory / 'model' / 'weights.npz'), network.layers, network.checkpoint)
+    with open(directory / 'model' / 'checkpoint', 'w') as f:
+        f.write('model_checkpoint_path: "{}"\n'.format(network.checkpoint))
+
+    patch = pytest.MonkeyPatch()
+    patch.chdir(directory)
+    patch.setenv('OPENING_BOOK_PLIES', '0')
+    patch.setenv('BATCH_WINDOW_MS', '0')
+    sys.modules.pop('app', None)
+    app = importlib.import_module('app')
+    assert app.model.checkpoint == network.checkpoint
+
+    yield app.app.test_client()
+    patch.undo()
+    sys.modules.pop('app', None)
+
+
+def test_single_and_batch_endpoints_agree(client):
+
+    # Todos os tabuleiros jogáveis e uma amostra dos demais (vitórias, cheios, contagens impossíveis)
+    counts = (ALL_BOARDS == -1).sum(axis = 1) - (ALL_BOARDS == 1).sum(axis = 1)
+    playable = np.flatnonzero(((counts == 0) | (counts == 1)) & (ALL_BOARDS == 0).any(axis = 1))
+    others = np.random.default_rng(0).choice(np.setdiff1d(np.arange(len(ALL_BOARDS)), playable), 500, replace = False)
+    boards = ALL_BOARDS[np.concatenate([playable, others])]
+
+    batch = client.post('/api/ticky/batch', json = {'boards': boards.tolist()}).get_json()['moves']
+    for board, move in zip(boards.tolist(), batch):
+        assert client.post('/api/ticky', json = {'data': board}).get_json() == move, board
+
+
+# Sem MODEL_DIR/weights.npz do último checkpoint, a app começa sem modelo, sem importar o tensorflow
+def test_starts_without_exported_weights(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / 'model')
+    with open(tmp_path / 'model' / 'checkpoint', 'w') as f:
+        f.write('model_checkpoint_path: "model.ckpt-1"\n')
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(sys.modules, 'tensorflow', None)
+    sys.modules.pop('app', None)
+    app = importlib.import_module('app')
+    assert app.model.network is None and app.model.moveCache is None
+
+    move = app.app.test_client().post('/api/ticky', json = {'data': [0] * 9}).get_json()
+    assert move in range(9)
+    sys.modules.pop('app', None)
+
+
+# Recargas simultâneas do mesmo checkpoint novo: só uma carrega e troca o modelo
+def test_concurrent_reloads_swap_once(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / 'model')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(sys.modules, 'tensorflow', None)
+    sys.modules.pop('app', None)
+    app = importlib.import_module('app')
+
+    network = randomNetwork(8)
+    saveWeights(str(tmp_path / 'model' / 'weights.npz'), network.layers, network.checkpoint)
+    with open(tmp_path / 'model' / 'checkpoint', 'w') as f:
+        f.write('model_checkpoint_path: "{}"\n'.format(network.checkpoint))
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda _: app.reloadModel(), range(4)))
+    assert results.count(True) == 1
+    assert app.model.checkpoint == network.checkpoint and app.model.network.checkpoint == network.checkpoint
+    sys.modules.pop('app', None)
@@ -0,0 +1,143 @@
+# Ambiente vetorizado do Tic Tac Toe: milhares de tabuleiros em um único array (N, boardSize) de int8
+# As vitórias são detectadas somando as casas de cada sequência da tabela de índices (LINE_INDEXES)
+# e os movimentos legais são uma máscara. Uma única passada da rede escolhe a jogada de todos os jogos ativos.
+# O tamanho do tabuleiro vem de game_config.py.
+
+# Imports
+import numpy as np
+from game_config import winning_length, boardSize, ACTION_DTYPE, LINE_INDEXES, LINES_THROUGH_TABLE
+
+# Recompensas (as mesmas de playaGame)
+win_reward = 10
+loss_reward = -1
+draw_reward = 3
+
+
+# Tabuleiros com uma sequência completa de um mesmo jogador
+# boards[:, LINE_INDEXES] tem forma (N, sequências, winning_length)
+# Com moves (a última casa jogada em cada tabuleiro), só as sequências que passam por ela são somadas
+def winners(boards, moves = None):
+    if moves is None:
+        return (np.abs(boards[:, LINE_INDEXES].sum(axis = 2)) == winning_length).any(axis = 1)
+
+    lines = LINE_INDEXES[LINES_THROUGH_TABLE[moves]]
+    cells = boards[np.arange(len(boards))[:, None, None], lines]
+    return (np.abs(cells.sum(axis = 2)) == winning_length).any(axis = 1)
+
+# Máscara dos movimentos legais (casas vazias)
+def legalMoves(boards):
+    return boards == 0
+
+# Tabuleiros sem casas vazias
+def fullBoards(boards):
+    return (boards != 0).all(axis = 1)
+
+
+class VectorTicTacToe:
+
+    def __init__(self, numGames, seed = None):
+        self.numGames = numGames
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((numGames, boardSize), dtype = np.int8)
+
+    def reset(self):
+        self.boards[:] = 0
+        return self.boards
+
+    # Uma casa vazia sorteada em cada tabuleiro
+    def randomLegal(self, boards):
+        scores = self.rng.random(boards.shape)
+        scores[boards != 0] = -1
+        return np.argmax(scores, axis = 1)
+
+    # Joga numGames jogos ao mesmo tempo, com as mesmas regras de playaGame:
+    # o agente (1) escolhe a previsão da rede ou, com probabilidade e, uma casa aleatória;
+    # o oponente (-1) usa a previsão da rede no tabuleiro invertido em 80% das vezes.
+    # qFunction recebe os estados (M, 9) em float32 e retorna os valores Q (M, 9).
+    # opponentMoves, se informado, escolhe a jogada do oponente em cada tabuleiro (ex.: Solver.opponentMoves).
+    # Retorna as transições (estados, ações, recompensas, próximos estados, fim de jogo, jogo)
+    # e as contagens de vitórias, derrotas e empates.
+    def selfPlay(self, qFunction, e, opponentMoves = None):
+        boards = self.reset()
+        allGames = np.arange(self.numGames)
+
+        # O oponente começa em metade dos jogos: previsão da rede com probabilidade 2/3
+        first = np.flatnonzero(self.rng.random(self.numGames) < 0.5)
+        if len(first):
+            best = np.argmax(qFunction(np.zeros((1, boardSize), dtype = np.float32))[0])
+            moves = np.where(self.rng.integers(0, 3, len(first)) == 1, self.randomLegal(boards[first]), best)
+            boards[first, moves] = -1
+
+        active = np.ones(self.numGames, dtype = bool)
+        won, lost, draw = 0, 0, 0
+        records = []
+
+        while active.any():
+            games = allGames[active]
+            board = boards[games]
+            states = board.copy()
+            count = len(games)
+            index = np.arange(count)
+
+            # Jogada do agente
+            pred = np.argmax(qFunction(board.astype(np.float32)), axis = 1)
+            explore = self.rng.random(count) <= e
+            action = np.where(explore, self.randomLegal(board), pred)
+
+            # Uma previsão em casa ocupada perde o jogo
+            illegal = board[index, action] != 0
+            legal = ~illegal
+            board[index[legal], action[legal]] = 1
+
+            agentWon = legal & winners(board, action)
+            agentDraw = legal & ~agentWon & fullBoards(board)
+            going = ~(illegal | agentWon | agentDraw)
+
+            # Jogada do oponente nos jogos que continuam
+            opponentWon = np.zeros(count, dtype = bool)
+            opponentDraw = np.zeros(count, dtype = bool)
+            if going.any():
+                opponentBoard = board[going]
+                if opponentMoves:
+                    opponentAction = opponentMoves(opponentBoard)
+                else:
+                    opponentPred = np.argmax(qFunction(-opponentBoard.astype(np.float32)), axis = 1)
+                    falsePrediction = opponentBoard[np.arange(len(opponentBoard)), opponentPred] != 0
+                    usePred = ~falsePrediction & (self.rng.random(len(opponentBoard)) < 0.8)
+                    opponentAction = np.where(usePred, opponentPred, self.randomLegal(opponentBoard))
+
+                opponentBoard[np.arange(len(opponentBoard)), opponentAction] = -1
+                board[going] = opponentBoard
+
+                opponentWon[going] = winners(opponentBoard, opponentAction)
+                opponentDraw[going] = ~opponentWon[going] & fullBoards(opponentBoard)
+
+            rewards = np.zeros(count, dtype = np.float32)
+            rewards[illegal | opponentWon] = loss_reward
+            rewards[agentWon] = win_reward
+            rewards[agentDraw | opponentDraw] = draw_reward
+            dones = illegal | agentWon | agentDraw | opponentWon | opponentDraw
+
+            records.append((states, action.astype(ACTION_DTYPE), rewards, board.copy(), dones, games))
+            boards[games] = board
+            active[games[dones]] = False
+
+            won += int(agentWon.sum())
+            lost += int((illegal | opponentWon).sum())
+            draw += int((agentDraw | opponentDraw).sum())
+
+        transitions = tuple(np.concatenate(column) for column in zip(*records))
+        return transitions, (won, lost, draw)
+
+    # Converte as transições para o formato de playaGame (uma lista de jogadas por jogo)
+    @staticmethod
+    def toGameLists(transitions):
+        states, actionsTaken, rewards, nextStates, dones, games = transitions
+        order = np.argsort(games, kind = 'stable')
+        ends = np.flatnonzero(np.diff(games[order])) + 1
+
+        GamesList = []
+        for gameIndexes in np.split(order, ends):
+            GamesList.append([[states[i].astype(int), [int(actionsTaken[i])], [float(rewards[i])], nextStates[i].astype(int)]
+                              for i in gameIndexes])
+        return GamesList
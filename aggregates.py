@@ -0,0 +1,600 @@
+# Agregações pré-calculadas (cubo) para os callbacks do dashboard de vendas
+
+# Imports
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from instrumentation import instrumenta
+
+# Dimensões exibidas no subplot da página inicial
+DIMENSOES = ['Tipo Entrega', 'Segmento', 'Regiao', 'Categoria']
+
+# Chave de agrupamento usada no mapa e no gráfico de barras por estado
+CHAVE_ESTADOS = ['Estado', 'Codigo_Estado', 'Regiao']
+
+# Colunas somadas em cada célula do cubo
+SOMAS = ['Venda', 'Lucro', 'Quantidade', 'Desconto_Soma', 'Transacoes']
+
+
+# Função para somar as métricas por uma ou mais colunas
+# Guardamos somas e contagens (e não médias) para que as células possam ser combinadas depois
+@instrumenta('soma_por')
+def soma_por(dataframe, colunas):
+
+    # Agregação
+    somas = dataframe.groupby(by = colunas, as_index = False, observed = True).agg(Venda = ('Venda', 'sum'),
+                                                                                  Lucro = ('Lucro', 'sum'),
+                                                                                  Quantidade = ('Quantidade', 'sum'),
+                                                                                  Desconto_Soma = ('Desconto', 'sum'),
+                                                                                  Transacoes = ('Desconto', 'size'))
+    return somas
+
+# Função para combinar duas tabelas de somas (ex.: somas atuais + somas das linhas novas)
+def combina_somas(atual, novas, colunas):
+    combinado = pd.concat([atual, novas], ignore_index = True)
+    return combinado.groupby(by = colunas, as_index = False, observed = True)[SOMAS].sum()
+
+# Função para calcular as métricas derivadas (desconto médio e margem de lucro) a partir das somas
+def finaliza(somas, colunas):
+
+    grouped = somas[colunas + ['Venda', 'Lucro', 'Quantidade']].copy()
+
+    # Desconto médio
+    grouped['Desconto'] = np.divide(somas['Desconto_Soma'], somas['Transacoes'])
+
+    # Calculando a margem de lucro
+    grouped['Margem_Lucro'] = np.multiply(np.divide(grouped['Lucro'], grouped['Venda']), 100).round(2)
+
+    # Total de transações (usado na aba 'Transactions')
+    grouped['Transacoes'] = somas['Transacoes']
+
+    return grouped
+
+# Função para calcular a impressão digital (versão) de um dataset
+def impressao_digital(dataframe):
+    hashes = pd.util.hash_pandas_object(dataframe, index = False).values
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+
+# Cubo de agregados: uma tabela de somas por dimensão, construída uma única vez
+class CuboAgregado:
+
+    def __init__(self, dataframe, dimensoes = DIMENSOES):
+        self.dimensoes = list(dimensoes)
+        self._trava = threading.Lock()
+        if dataframe is not None:
+            self.atualiza(dataframe)
+
+    # Cria um cubo a partir de tabelas de somas já calculadas (ex.: um subconjunto filtrado)
+    @classmethod
+    def de_somas(cls, somas, somas_estados, versao):
+        cubo = cls(None, dimensoes = list(somas))
+        cubo.somas = somas
+        cubo.somas_estados = somas_estados
+        cubo.versao = versao
+        cubo._tabelas = {}
+        cubo._estados = None
+        return cubo
+
+    # Reconstrói todas as tabelas a partir do dataset completo
+    def atualiza(self, dataframe):
+        somas = {dim: soma_por(dataframe, [dim]) for dim in self.dimensoes}
+        somas_estados = soma_por(dataframe, CHAVE_ESTADOS)
+        versao = impressao_digital(dataframe)
+
+        with self._trava:
+            self.somas = somas
+            self.somas_estados = somas_estados
+            self.versao = versao
+            self._tabelas = {}
+            self._estados = None
+
+    # Incorpora apenas as linhas novas, somando as suas parcelas às tabelas existentes
+    def incorpora(self, novos):
+        parciais = {dim: soma_por(novos, [dim]) for dim in self.dimensoes}
+        parciais_estados = soma_por(novos, CHAVE_ESTADOS)
+        versao_novos = impressao_digital(novos)
+
+        with self._trava:
+            self.somas = {dim: combina_somas(self.somas[dim], parciais[dim], [dim]) for dim in self.dimensoes}
+            self.somas_estados = combina_somas(self.somas_estados, parciais_estados, CHAVE_ESTADOS)
+            self.versao = hashlib.sha1((self.versao + versao_novos).encode('utf-8')).hexdigest()[:16]
+            self._tabelas = {}
+            self._estados = None
+
+    # Retorna a tabela agregada de uma dimensão (somas finalizadas, com desconto médio e margem de lucro)
+    @instrumenta('cubo_fatia')
+    def fatia(self, dimensao):
+        with self._trava:
+            if dimensao not in self._tabelas:
+                self._tabelas[dimensao] = finaliza(self.somas[dimensao], [dimensao])
+            return self._tabelas[dimensao]
+
+    # Retorna os agregados por estado, do maior para o menor total de vendas
+    @instrumenta('cubo_estados')
+    def estados(self):
+        with self._trava:
+            if self._estados is None:
+                estados = finaliza(self.somas_estados, CHAVE_ESTADOS)
+                self._estados = estados.sort_values('Venda', ascending = False, ignore_index = True)
+            return self._estados
+
+    # Totais gerais do dataset
+    def totais(self):
+        tabela = self.fatia(self.dimensoes[0])
+        return {'Venda': tabela['Venda'].sum(), 'Lucro': tabela['Lucro'].sum(), 'Transacoes': tabela['Transacoes'].sum()}
+
+
+# Função para codificar uma coluna como inteiros (códigos) + categorias ordenadas
+def codifica(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return np.asarray(serie.cat.codes), serie.cat.categories
+    codigos, categorias = pd.factorize(serie, sort = True)
+    return codigos, categorias
+
+
+# Tabela cruzada (linha x coluna) de várias métricas, calculada com bincount sobre um índice plano
+# Substitui o pd.crosstab e fica residente, recebendo apenas as parcelas das linhas novas
+class TabelaCruzada:
+
+    def __init__(self, dataframe, linha, coluna, valores = ('Quantidade', 'Lucro', 'Venda')):
+        self.linha = linha
+        self.coluna = coluna
+        self.valores = list(valores)
+        self._trava = threading.Lock()
+
+        codigos_linha, self.categorias_linha = codifica(dataframe[linha])
+        codigos_coluna, self.categorias_coluna = codifica(dataframe[coluna])
+        self.contagem, self.somas = self._acumula(dataframe, codigos_linha, codigos_coluna)
+
+    # Cria a tabela a partir de códigos já calculados (ex.: as células de um filtro)
+    # pesos é um dicionário valor -> array, alinhado com os códigos; transacoes é o número de linhas
+    # representadas por cada código (None quando cada código é uma linha)
+    @classmethod
+    def de_codigos(cls, linha, coluna, codigos_linha, categorias_linha, codigos_coluna, categorias_coluna, pesos, transacoes = None):
+        tabela = cls.__new__(cls)
+        tabela.linha, tabela.coluna = linha, coluna
+        tabela.valores = list(pesos)
+        tabela._trava = threading.Lock()
+        tabela.categorias_linha, tabela.categorias_coluna = categorias_linha, categorias_coluna
+        tabela.contagem, tabela.somas = tabela._acumula(pesos, codigos_linha, codigos_coluna, transacoes)
+        return tabela
+
+    # Soma todas as métricas de uma vez, a partir do mesmo índice plano
+    @instrumenta('tabela_cruzada')
+    def _acumula(self, dataframe, codigos_linha, codigos_coluna, transacoes = None):
+        linhas, colunas = len(self.categorias_linha), len(self.categorias_coluna)
+
+        # Linhas com chave ausente (código -1) são descartadas, como no pd.crosstab
+        validos = (codigos_linha >= 0) & (codigos_coluna >= 0)
+        plano = codigos_linha[validos].astype(np.int64) * colunas + codigos_coluna[validos]
+
+        contagem = np.bincount(plano, weights = None if transacoes is None else transacoes[validos], minlength = linhas * colunas).reshape(linhas, colunas)
+        somas = {valor: np.bincount(plano, weights = np.asarray(dataframe[valor], dtype = float)[validos], minlength = linhas * colunas).reshape(linhas, colunas)
+                 for valor in self.valores}
+
+        return contagem, somas
+
+    # Amplia as matrizes quando o lote novo traz categorias ainda não vistas
+    def _amplia(self, categorias_linha, categorias_coluna):
+        posicao_linha = categorias_linha.get_indexer(self.categorias_linha)
+        posicao_coluna = categorias_coluna.get_indexer(self.categorias_coluna)
+        indices = np.ix_(posicao_linha, posicao_coluna)
+
+        contagem = np.zeros((len(categorias_linha), len(categorias_coluna)), dtype = self.contagem.dtype)
+        contagem[indices] = self.contagem
+        somas = {}
+        for valor, matriz in self.somas.items():
+            somas[valor] = np.zeros(contagem.shape)
+            somas[valor][indices] = matriz
+
+        self.categorias_linha, self.categorias_coluna = categorias_linha, categorias_coluna
+        self.contagem, self.somas = contagem, somas
+
+    # Incorpora as linhas novas
+    def incorpora(self, novos):
+        with self._trava:
+            categorias_linha = self.categorias_linha.union(pd.Index(novos[self.linha].dropna().unique()))
+            categorias_coluna = self.categorias_coluna.union(pd.Index(novos[self.coluna].dropna().unique()))
+            if len(categorias_linha) != len(self.categorias_linha) or len(categorias_coluna) != len(self.categorias_coluna):
+                self._amplia(categorias_linha, categorias_coluna)
+
+            codigos_linha = self.categorias_linha.get_indexer(np.asarray(novos[self.linha]))
+            codigos_coluna = self.categorias_coluna.get_indexer(np.asarray(novos[self.coluna]))
+            contagem, somas = self._acumula(novos, codigos_linha, codigos_coluna)
+
+            self.contagem = self.contagem + contagem
+            self.somas = {valor: self.somas[valor] + somas[valor] for valor in self.valores}
+
+    # Retorna a tabela de uma métrica no mesmo formato do pd.crosstab (NaN onde não há vendas)
+    def tabela(self, valor):
+        with self._trava:
+            matriz = np.where(self.contagem > 0, self.somas[valor], np.nan)
+            tabela = pd.DataFrame(matriz,
+                                  index = pd.Index(self.categorias_linha, name = self.linha),
+                                  columns = pd.Index(self.categorias_coluna, name = self.coluna))
+
+        # Remove linhas e colunas sem nenhuma venda
+        return tabela.dropna(how = 'all').dropna(axis = 1, how = 'all')
+
+
+
+
+# Dimensões que podem ser filtradas (cross-filter) no dashboard
+DIMENSOES_FILTRO = ['Estado', 'Regiao', 'Segmento', 'Categoria', 'Tipo Entrega']
+
+# Colunas que identificam uma célula do cubo de filtros: as dimensões filtráveis e as do cubo, a chave dos estados
+# e os eixos das figuras (desconto no box plot e no mapa de calor, sub-categoria no sunburst e no mapa de calor)
+COLUNAS_CELULA = list(dict.fromkeys(DIMENSOES_FILTRO + DIMENSOES + CHAVE_ESTADOS + ['Desconto', 'Sub-Categoria']))
+
+# Colunas de um grupo do box plot: as dimensões filtráveis e a faixa de desconto (o eixo x da figura)
+COLUNAS_GRUPO = DIMENSOES_FILTRO + ['Desconto']
+
+# Métricas somadas em cada célula (Lucro_Quantidade é o lucro ponderado pela quantidade, usado no sunburst)
+METRICAS = ['Venda', 'Lucro', 'Quantidade', 'Desconto', 'Lucro_Quantidade', 'Transacoes']
+
+# Faixas do histograma da margem de lucro de cada grupo e valores guardados em cada ponta do grupo
+FAIXAS_BOX = 128
+EXTREMOS_BOX = 32
+
+
+# Função para acrescentar valores depois das primeiras usadas posições de um array (linhas, em arrays 2-D)
+# Quando falta espaço, a capacidade dobra, então cada lote custa o seu tamanho (amortizado) e não o do dataset
+def acrescenta(array, usadas, novos):
+    if usadas + len(novos) > len(array):
+        maior = np.empty((max(2 * len(array), usadas + len(novos)),) + array.shape[1:], dtype = array.dtype)
+        maior[:usadas] = array[:usadas]
+        array = maior
+    array[usadas:usadas + len(novos)] = novos
+    return array
+
+# Função para separar as pontas de cada grupo: os EXTREMOS_BOX menores e os EXTREMOS_BOX maiores valores
+# Recebe os valores ordenados por grupo e, dentro do grupo, por valor; grupos pequenos completam a linha com NaN
+def pontas(grupos, valores):
+    inicio = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+    fim = np.r_[inicio[1:], len(grupos)] - 1
+    passos = np.arange(EXTREMOS_BOX)
+
+    # As posições da ponta superior começam depois da inferior, para que nenhum valor apareça duas vezes
+    baixo = inicio[:, None] + passos
+    alto = fim[:, None] - passos[::-1]
+    baixo_valido = baixo <= fim[:, None]
+    alto_valido = alto >= (inicio + EXTREMOS_BOX)[:, None]
+
+    extremos = np.full((len(inicio), 2 * EXTREMOS_BOX), np.nan)
+    extremos[:, :EXTREMOS_BOX] = np.where(baixo_valido, valores[np.minimum(baixo, fim[:, None])], np.nan)
+    extremos[:, EXTREMOS_BOX:] = np.where(alto_valido, valores[np.maximum(alto, inicio[:, None])], np.nan)
+    return grupos[inicio], extremos
+
+# Função para calcular os limites internos das faixas do histograma (quantis da amostra, para faixas com contagens parecidas)
+def limites_faixas(valores):
+    if not len(valores):
+        return np.zeros(FAIXAS_BOX - 1)
+    return np.quantile(valores, np.linspace(0, 1, FAIXAS_BOX + 1)[1:-1])
+
+
+# Combinações distintas de códigos (uma linha por combinação), com um número compacto para cada uma
+class Combinacoes:
+
+    def __init__(self, colunas, codigos):
+        self.colunas = list(colunas)
+        self.codigos = codigos
+        self.total = len(codigos)
+        self._ids = None
+
+    # Cria as combinações a partir dos códigos de cada linha; retorna também o número da combinação de cada linha
+    # A chave plana reserva o código 0 para valor ausente (-1); as combinações são numeradas na ordem em que aparecem
+    # (pd.factorize usa uma tabela hash, sem ordenar as linhas)
+    @classmethod
+    def de_linhas(cls, colunas, codigos, tamanhos):
+        forma = tuple(tamanho + 1 for tamanho in tamanhos)
+        chaves = np.zeros(len(codigos[0]), dtype = np.int64)
+        for codigo, tamanho in zip(codigos, forma):
+            chaves *= tamanho
+            chaves += np.asarray(codigo, dtype = np.int64) + 1
+
+        inversa, unicas = pd.factorize(chaves)
+        combinacoes = np.stack(np.unravel_index(unicas, forma), axis = 1).astype(np.int32) - 1
+        return cls(colunas, combinacoes), inversa
+
+    # Número de cada linha de um lote, acrescentando as combinações ainda não vistas no fim
+    def ids(self, codigos):
+        if self._ids is None:
+            self._ids = {tuple(linha): i for i, linha in enumerate(self.codigos[:self.total].tolist())}
+
+        novas = []
+        ids = np.empty(len(codigos[0]), dtype = np.int64)
+        for i, linha in enumerate(zip(*[codigo.tolist() for codigo in codigos])):
+            if linha not in self._ids:
+                self._ids[linha] = self.total + len(novas)
+                novas.append(linha)
+            ids[i] = self._ids[linha]
+
+        if novas:
+            self.codigos = acrescenta(self.codigos, self.total, np.array(novas, dtype = np.int32))
+            self.total += len(novas)
+        return ids
+
+    # Códigos de uma coluna nas combinações existentes
+    def coluna(self, coluna):
+        return self.codigos[:self.total, self.colunas.index(coluna)]
+
+    # Combinações que atendem ao filtro (ex.: {'Regiao': ['West'], 'Segmento': ['Consumer']})
+    def mascara(self, filtro, categorias):
+        mascara = np.ones(self.total, dtype = bool)
+        for dim, valores in (filtro or {}).items():
+            if valores:
+                selecionados = categorias[dim].get_indexer(pd.Index(valores))
+                mascara &= np.isin(self.coluna(dim), selecionados[selecionados >= 0])
+        return mascara
+
+
+# Cubo de células para o cross-filter
+# Cada célula é uma combinação distinta de COLUNAS_CELULA com as somas das suas linhas, e cada grupo do box plot
+# (COLUNAS_GRUPO) guarda um histograma da margem de lucro e os valores das pontas. Todas as dimensões filtráveis
+# são eixos das células e dos grupos, então um filtro é uma máscara sobre eles e as figuras filtradas são
+# reduções de O(células), sem tocar nas linhas do dataset
+class IndiceFiltros:
+
+    def __init__(self, dataframe):
+        self._trava = threading.Lock()
+        self.categorias = {}
+
+        codigos = {}
+        for coluna in COLUNAS_CELULA:
+            codigos[coluna], self.categorias[coluna] = codifica(dataframe[coluna])
+
+        # Células e somas por célula
+        self.celulas, celula = Combinacoes.de_linhas(COLUNAS_CELULA, [codigos[coluna] for coluna in COLUNAS_CELULA],
+                                                     [len(self.categorias[coluna]) for coluna in COLUNAS_CELULA])
+        del codigos
+        self.somas = np.stack([np.bincount(celula, weights = valores, minlength = self.celulas.total) for valores in self._metricas(dataframe)], axis = 1)
+
+        # Grupos do box plot, derivados das células (cada célula pertence a um único grupo)
+        self.grupos, grupo_celula = Combinacoes.de_linhas(COLUNAS_GRUPO, [self.celulas.coluna(coluna) for coluna in COLUNAS_GRUPO],
+                                                          [len(self.categorias[coluna]) for coluna in COLUNAS_GRUPO])
+        grupo = grupo_celula[celula]
+        del celula
+
+        # Apenas margens finitas com desconto entram no box plot (vendas zeradas geram margem infinita ou NaN)
+        margem = np.asarray(dataframe['Margem_Lucro'], dtype = float)
+        desconto = self.grupos.coluna('Desconto')[grupo]
+        validas = np.isfinite(margem) & (desconto >= 0)
+        grupo, margem, desconto = grupo[validas], margem[validas], desconto[validas]
+
+        # Limites das faixas de cada desconto, a partir de uma amostra das margens
+        passo = max(1, len(margem) // 1000000)
+        self.limites = np.array([limites_faixas(margem[::passo][desconto[::passo] == d]) for d in range(len(self.categorias['Desconto']))]).reshape(-1, FAIXAS_BOX - 1)
+        faixa = self._faixas(desconto, margem)
+
+        # Histograma de cada grupo (em float, para que a soma dos grupos selecionados seja um produto de matrizes)
+        self.contagem = np.bincount(grupo * FAIXAS_BOX + faixa, minlength = self.grupos.total * FAIXAS_BOX).reshape(self.grupos.total, FAIXAS_BOX).astype(float)
+
+        # Mínimo e máximo de cada faixa de cada desconto, usados para interpolar os quartis dentro da faixa
+        forma = self.limites.shape[:1] + (FAIXAS_BOX,)
+        self.minimos = np.full(forma, np.inf)
+        self.maximos = np.full(forma, -np.inf)
+        np.minimum.at(self.minimos.ravel(), desconto * FAIXAS_BOX + faixa, margem)
+        np.maximum.at(self.maximos.ravel(), desconto * FAIXAS_BOX + faixa, margem)
+
+        # Pontas de cada grupo: só as linhas das faixas mais baixas e mais altas do grupo que somam EXTREMOS_BOX
+        # valores podem estar nas pontas, então apenas elas são ordenadas por grupo e valor
+        acumulado = np.cumsum(self.contagem, axis = 1)
+        corte_inferior = (acumulado < EXTREMOS_BOX).sum(axis = 1)
+        corte_superior = (acumulado <= acumulado[:, -1:] - EXTREMOS_BOX).sum(axis = 1)
+        candidatas = (faixa <= corte_inferior[grupo]) | (faixa >= corte_superior[grupo])
+        grupo, margem = grupo[candidatas], margem[candidatas]
+
+        ordem = np.lexsort((margem, grupo))
+        self.extremos = np.full((self.grupos.total, 2 * EXTREMOS_BOX), np.nan)
+        if len(grupo):
+            ids, extremos = pontas(grupo[ordem], margem[ordem])
+            self.extremos[ids] = extremos
+
+    # Métricas de cada linha, na ordem de METRICAS
+    @staticmethod
+    def _metricas(dataframe):
+        venda, lucro, quantidade, desconto = (np.asarray(dataframe[coluna], dtype = float) for coluna in ['Venda', 'Lucro', 'Quantidade', 'Desconto'])
+        return [venda, lucro, quantidade, desconto, lucro * quantidade, np.ones(len(venda))]
+
+    # Faixa do histograma de cada margem, de acordo com os limites do seu desconto
+    def _faixas(self, desconto, margem):
+        faixa = np.zeros(len(margem), dtype = np.int64)
+        for d in np.unique(desconto):
+            linhas = desconto == d
+            faixa[linhas] = np.searchsorted(self.limites[d], margem[linhas], side = 'right')
+        return faixa
+
+    # Acrescenta as linhas de um lote novo sem reconstruir o cubo
+    # Categorias novas entram no fim da lista, então os códigos das células existentes não mudam
+    def incorpora(self, novos):
+        with self._trava:
+            codigos = {}
+            for coluna in COLUNAS_CELULA:
+                categorias = self.categorias[coluna]
+                valores = pd.Index(np.asarray(novos[coluna]))
+                faltantes = valores[valores.notna()].unique().difference(categorias)
+                if len(faltantes):
+                    categorias = self.categorias[coluna] = categorias.append(faltantes)
+                codigos[coluna] = categorias.get_indexer(valores).astype(np.int32)
+
+            # Somas das células (as células novas começam zeradas)
+            usadas = self.celulas.total
+            celula = self.celulas.ids([codigos[coluna] for coluna in COLUNAS_CELULA])
+            self.somas = acrescenta(self.somas, usadas, np.zeros((self.celulas.total - usadas, len(METRICAS))))
+            for i, valores in enumerate(self._metricas(novos)):
+                np.add.at(self.somas[:, i], celula, valores)
+
+            # Histogramas e pontas dos grupos
+            usados = self.grupos.total
+            grupo = self.grupos.ids([codigos[coluna] for coluna in COLUNAS_GRUPO])
+            novos_grupos = self.grupos.total - usados
+            self.contagem = acrescenta(self.contagem, usados, np.zeros((novos_grupos, FAIXAS_BOX)))
+            self.extremos = acrescenta(self.extremos, usados, np.full((novos_grupos, 2 * EXTREMOS_BOX), np.nan))
+
+            margem = np.asarray(novos['Margem_Lucro'], dtype = float)
+            validas = np.isfinite(margem) & (codigos['Desconto'] >= 0)
+            grupo, margem, desconto = grupo[validas], margem[validas], codigos['Desconto'][validas]
+
+            # Descontos novos recebem limites calculados a partir do próprio lote
+            descontos_novos = range(len(self.limites), len(self.categorias['Desconto']))
+            if len(descontos_novos):
+                self.limites = np.vstack([self.limites] + [limites_faixas(margem[desconto == d]) for d in descontos_novos])
+                self.minimos = np.vstack([self.minimos, np.full((len(descontos_novos), FAIXAS_BOX), np.inf)])
+                self.maximos = np.vstack([self.maximos, np.full((len(descontos_novos), FAIXAS_BOX), -np.inf)])
+
+            faixa = self._faixas(desconto, margem)
+            np.add.at(self.contagem, (grupo, faixa), 1)
+            np.minimum.at(self.minimos.ravel(), desconto * FAIXAS_BOX + faixa, margem)
+            np.maximum.at(self.maximos.ravel(), desconto * FAIXAS_BOX + faixa, margem)
+
+            # As pontas dos grupos tocados são recalculadas a partir das pontas atuais e das margens novas
+            tocados = np.unique(grupo)
+            if len(tocados):
+                atuais = self.extremos[tocados]
+                existentes = ~np.isnan(atuais)
+                grupos_pontas = np.concatenate([np.repeat(tocados, existentes.sum(axis = 1)), grupo])
+                valores_pontas = np.concatenate([atuais[existentes], margem])
+                ordem = np.lexsort((valores_pontas, grupos_pontas))
+                ids, extremos = pontas(grupos_pontas[ordem], valores_pontas[ordem])
+                self.extremos[ids] = extremos
+
+    # Códigos e somas das células que atendem ao filtro
+    def _selecao(self, filtro):
+        with self._trava:
+            mascara = self.celulas.mascara(filtro, self.categorias)
+            return self.celulas.codigos[:self.celulas.total][mascara], self.somas[:self.celulas.total][mascara]
+
+    # Somas das células agrupadas por algumas colunas, no mesmo formato de soma_por
+    # Um bincount por métrica sobre a chave plana das colunas; só as chaves com alguma célula são mantidas
+    def _agrega(self, colunas, codigos, somas, metricas):
+        chaves = codigos[:, [COLUNAS_CELULA.index(coluna) for coluna in colunas]]
+        forma = tuple(len(self.categorias[coluna]) for coluna in colunas)
+
+        # Células com chave ausente (código -1) são descartadas, como no groupby
+        validas = (chaves >= 0).all(axis = 1)
+        plano = np.ravel_multi_index(tuple(chaves[validas].T), forma)
+        tamanho = int(np.prod(forma))
+        presentes = np.flatnonzero(np.bincount(plano, minlength = tamanho))
+
+        tabela = pd.DataFrame({coluna: np.asarray(self.categorias[coluna])[codigo] for coluna, codigo in zip(colunas, np.unravel_index(presentes, forma))})
+        for nome, metrica in metricas.items():
+            tabela[nome] = np.bincount(plano, weights = somas[validas, METRICAS.index(metrica)], minlength = tamanho)[presentes]
+        return tabela
+
+    # Cubo de agregados restrito ao filtro: cada dimensão é uma soma sobre as células selecionadas
+    @instrumenta('filtro_cubo')
+    def cubo(self, filtro, versao):
+        codigos, somas = self._selecao(filtro)
+        metricas = {'Venda': 'Venda', 'Lucro': 'Lucro', 'Quantidade': 'Quantidade', 'Desconto_Soma': 'Desconto', 'Transacoes': 'Transacoes'}
+
+        tabelas = {}
+        for colunas in [[dim] for dim in DIMENSOES] + [CHAVE_ESTADOS]:
+            tabela = self._agrega(colunas, codigos, somas, metricas)
+            tabela['Transacoes'] = tabela['Transacoes'].astype(np.int64)
+            tabelas[tuple(colunas)] = tabela
+
+        return CuboAgregado.de_somas({dim: tabelas[(dim,)] for dim in DIMENSOES}, tabelas[tuple(CHAVE_ESTADOS)], versao)
+
+    # Tabela cruzada restrita ao filtro
+    @instrumenta('filtro_cruzada')
+    def cruzada(self, filtro, linha, coluna, valores = ('Quantidade', 'Lucro', 'Venda')):
+        codigos, somas = self._selecao(filtro)
+        pesos = {valor: somas[:, METRICAS.index(valor)] for valor in valores}
+        return TabelaCruzada.de_codigos(linha, coluna,
+                                        codigos[:, COLUNAS_CELULA.index(linha)], self.categorias[linha],
+                                        codigos[:, COLUNAS_CELULA.index(coluna)], self.categorias[coluna],
+                                        pesos, transacoes = somas[:, METRICAS.index('Transacoes')])
+
+    # Produtos por Categoria/Sub-Categoria restritos ao filtro (base do sunburst)
+    # A cor do sunburst é a média do lucro ponderada pela quantidade, então guardamos a média já ponderada
+    @instrumenta('filtro_produtos')
+    def produtos(self, filtro):
+        codigos, somas = self._selecao(filtro)
+        produtos = self._agrega(['Categoria', 'Sub-Categoria'], codigos, somas, {'Quantidade': 'Quantidade', 'Lucro': 'Lucro_Quantidade'})
+        produtos['Lucro'] = np.divide(produtos['Lucro'], produtos['Quantidade'])
+        return produtos
+
+    # Estatísticas do box plot (quartis, limites e outliers) da margem de lucro por desconto, restritas ao filtro
+    # Os histogramas dos grupos selecionados são somados por desconto e os quartis são interpolados dentro da faixa
+    # (entre o mínimo e o máximo da faixa), com erro limitado à largura de uma faixa. Limites e outliers vêm das
+    # pontas guardadas de cada grupo, que são valores exatos
+    # max_outliers limita o número de outliers devolvidos, mantendo os mais distantes dos limites
+    @instrumenta('filtro_box')
+    def box(self, filtro, max_outliers = None):
+        with self._trava:
+            desconto = self.grupos.coluna('Desconto')
+            mascara = self.grupos.mascara(filtro, self.categorias)
+
+            # Uma linha por desconto com os grupos selecionados: a soma dos histogramas é um produto de matrizes
+            indicador = (desconto == np.arange(len(self.limites))[:, None]) & mascara
+            contagem = indicador.astype(float) @ self.contagem[:self.grupos.total]
+            minimos, maximos = self.minimos.copy(), self.maximos.copy()
+
+            selecionados = np.flatnonzero(mascara & (desconto >= 0))
+            extremos = self.extremos[selecionados]
+            desconto = desconto[selecionados]
+
+        total = contagem.sum(axis = 1)
+        descontos = np.flatnonzero(total > 0)
+        colunas = ['Desconto', 'q1', 'mediana', 'q3', 'limite_inferior', 'limite_superior', 'contagem']
+        if not len(descontos):
+            return pd.DataFrame(columns = colunas), pd.DataFrame(columns = ['Desconto', 'Margem_Lucro'])
+
+        # Descontos sem nenhuma margem válida ficam de fora
+        contagem, minimos, maximos, total = contagem[descontos], minimos[descontos], maximos[descontos], total[descontos]
+        acumulado = np.cumsum(contagem, axis = 1)
+        linhas = np.arange(len(descontos))
+
+        # k-ésimo menor valor (a partir de 0) de cada desconto, distribuído uniformemente dentro da sua faixa
+        def valor(k):
+            faixa = (acumulado <= k[:, None]).sum(axis = 1)
+            n = contagem[linhas, faixa]
+            fracao = np.divide(k - (acumulado[linhas, faixa] - n), n - 1, out = np.zeros(len(k)), where = n > 1)
+            return minimos[linhas, faixa] + (maximos[linhas, faixa] - minimos[linhas, faixa]) * fracao
+
+        # Quantis por interpolação linear entre posições, como nas estatísticas exatas
+        def quantil(q):
+            posicao = q * (total - 1)
+            baixo, alto = np.floor(posicao), np.ceil(posicao)
+            return valor(baixo) + (valor(alto) - valor(baixo)) * (posicao - baixo)
+
+        q1, mediana, q3 = quantil(0.25), quantil(0.5), quantil(0.75)
+        iqr = q3 - q1
+        cerca_inferior, cerca_superior = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+        # Pontas de cada desconto (a linha de cada valor é a posição do seu desconto em descontos)
+        linha_extremo = np.repeat(np.searchsorted(descontos, desconto), extremos.shape[1])
+        extremos = extremos.ravel()
+        existentes = ~np.isnan(extremos)
+        linha_extremo, extremos = linha_extremo[existentes], extremos[existentes]
+        dentro = (extremos >= cerca_inferior[linha_extremo]) & (extremos <= cerca_superior[linha_extremo])
+
+        # Limites (whiskers): valores extremos dentro de 1,5 x IQR, tirados das pontas; quando nenhuma ponta
+        # fica dentro dos limites, usamos o mínimo (ou máximo) das faixas ocupadas dentro deles
+        ocupadas = contagem > 0
+        limite_inferior = np.full(len(descontos), np.inf)
+        limite_superior = np.full(len(descontos), -np.inf)
+        np.minimum.at(limite_inferior, linha_extremo[dentro], extremos[dentro])
+        np.maximum.at(limite_superior, linha_extremo[dentro], extremos[dentro])
+        limite_inferior = np.where(np.isinf(limite_inferior), np.where(ocupadas & (minimos >= cerca_inferior[:, None]), minimos, np.inf).min(axis = 1), limite_inferior)
+        limite_superior = np.where(np.isinf(limite_superior), np.where(ocupadas & (maximos <= cerca_superior[:, None]), maximos, -np.inf).max(axis = 1), limite_superior)
+
+        estatisticas = pd.DataFrame({'Desconto': np.asarray(self.categorias['Desconto'])[descontos],
+                                     'q1': q1,
+                                     'mediana': mediana,
+                                     'q3': q3,
+                                     'limite_inferior': limite_inferior,
+                                     'limite_superior': limite_superior,
+                                     'contagem': total.astype(np.int64)})
+
+        # Outliers: pontas fora dos limites, ordenadas pela distância até o limite mais próximo
+        distancia = np.maximum(cerca_inferior[linha_extremo] - extremos, extremos - cerca_superior[linha_extremo])
+        fora = np.flatnonzero(~dentro)
+        if max_outliers is not None and len(fora) > max_outliers:
+            fora = fora[np.argpartition(-distancia[fora], max_outliers - 1)[:max_outliers]] if max_outliers > 0 else fora[:0]
+        fora = fora[np.lexsort((extremos[fora], linha_extremo[fora]))]
+        outliers = pd.DataFrame({'Desconto': estatisticas['Desconto'].values[linha_extremo[fora]], 'Margem_Lucro': extremos[fora]})
+
+        return estatisticas, outliers
@@ -3,11 +3,12 @@
 # Execute: pip install -r requirements.txt
 
 # Imports
+import os
 import dash
+import threading
 import plotly
 import locale
 import numpy as np
-import pandas as pd
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
@@ -15,127 +16,212 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from dash.dependencies import Input, Output, State
+from flask import jsonify
+from aggregates import CuboAgregado, TabelaCruzada, IndiceFiltros, DIMENSOES
+from figure_cache import CacheFiguras
+from columnar_loader import carrega_dataset
+from ingest import MonitorIngestao
+from payload import orcamento
+from instrumentation import instrumenta, registra_rotas
 import warnings
 warnings.filterwarnings("ignore")
 
 # Carregando os dados
-df = pd.read_csv('dados/dataset.csv')
+# O CSV é convertido uma única vez para o cache colunar (dados/dataset.colunar), aberto com memory-map
+# DASHBOARD_DATASET permite apontar para outro arquivo (ex.: datasets sintéticos do benchmark.py)
+DATASET = os.environ.get('DASHBOARD_DATASET', 'dados/dataset.csv')
+df = carrega_dataset(DATASET)
 
 # Cálculo da margem de lucro bruto
 df['Margem_Lucro'] = np.multiply(np.divide(df['Lucro'], df['Venda']), 100).round(2)
 
-# Função para agrupamento
-def group_by(df,col):
-
-    # Agregação
-    grouped = df.groupby(by = col, as_index = False).agg({'Venda':'sum',
-                                                          'Lucro':'sum',
-                                                          'Quantidade':'sum',
-                                                          'Desconto':'mean'})
-
-    # Calculando a margem de lucro
-    grouped['Margem_Lucro'] = np.multiply(np.divide(grouped['Lucro'], grouped['Venda']), 100).round(2)
-    
-    return grouped
-
 # Variáveis para formatação
 title_font = {'size':20,'color':'black'}
 legend_font = {'size':16,'color':'black'}
 global_font = dict(family = "Roboto")
 
+# Número máximo de pontos por traço enviados ao navegador (0 desativa o limite)
+MAX_PONTOS_TRACO = int(os.environ.get('PAYLOAD_MAX_POINTS', 5000))
+
 # BoxPlot de desconto vs margem de lucro bruto
-figura_1 = px.box(df, 
-               x = 'Desconto', 
-               y = 'Margem_Lucro',
-               title = 'Comportamento da Margem de Lucro Bruto Por Faixa de Desconto',
-               labels = {'Desconto':'Desconto do Produto',
-                         'Margem_Lucro':'Margem de Lucro Bruto'}).update_traces(marker = {'color':'#3399CC'}).update_layout(height = 500, 
-                                                                                                                      width = 900, 
-                                                                                                                      title = {'font':title_font, 
-                                                                                                                               'x':0.5, 
-                                                                                                                               'y':0.9, 
-                                                                                                                               'xanchor':'center', 
-                                                                                                                               'yanchor':'middle'},
-                                                                                                                      font = global_font,
-                                                                                                                      legend = {'font':legend_font}, 
-                                                                                                                      font_color = 'black',
-                                                                                                                      plot_bgcolor = 'rgba(0,0,0,0)',
-                                                                                                                      paper_bgcolor = 'rgba(0,0,0,0)')
-figura_1.add_hline(y = 0, 
-                line_dash = "dot", 
-                annotation_text = "Lucro Zero", 
-                annotation_position = "bottom right")
-
-figura_1.add_vrect(x0 = 0.35, 
-                x1 = 0.45, 
-                annotation_text = "Declínio", 
-                annotation_position = "top left", 
-                fillcolor = "red", 
-                opacity = 0.20, 
-                line_width = 0)
-
-figura_1.add_vline(x = 0.41, 
-                line_width = 1, 
-                line_dash = "dash", 
-                line_color = "red")
+# Construído a partir dos quartis pré-calculados de cada faixa de desconto (IndiceFiltros.box), e não dos pontos brutos
+# Apenas os outliers são enviados como pontos, limitados a MAX_PONTOS_TRACO
+def cria_figura_1(box, outliers):
+
+    figura_1 = go.Figure(go.Box(x = box['Desconto'],
+                                q1 = box['q1'],
+                                median = box['mediana'],
+                                q3 = box['q3'],
+                                lowerfence = box['limite_inferior'],
+                                upperfence = box['limite_superior'],
+                                marker = {'color':'#3399CC'},
+                                showlegend = False)).update_layout(height = 500, 
+                                                                          width = 900, 
+                                                                          title = {'text':'Comportamento da Margem de Lucro Bruto Por Faixa de Desconto',
+                                                                                   'font':title_font, 
+                                                                                   'x':0.5, 
+                                                                                   'y':0.9, 
+                                                                                   'xanchor':'center', 
+                                                                                   'yanchor':'middle'},
+                                                                          xaxis_title = 'Desconto do Produto',
+                                                                          yaxis_title = 'Margem de Lucro Bruto',
+                                                                          font = global_font,
+                                                                          legend = {'font':legend_font}, 
+                                                                          font_color = 'black',
+                                                                          plot_bgcolor = 'rgba(0,0,0,0)',
+                                                                          paper_bgcolor = 'rgba(0,0,0,0)')
+    figura_1.add_trace(go.Scattergl(x = outliers['Desconto'],
+                                    y = outliers['Margem_Lucro'],
+                                    mode = 'markers',
+                                    marker = {'color':'#3399CC', 'size':4},
+                                    showlegend = False))
+    figura_1.add_hline(y = 0, 
+                    line_dash = "dot", 
+                    annotation_text = "Lucro Zero", 
+                    annotation_position = "bottom right")
+
+    figura_1.add_vrect(x0 = 0.35, 
+                    x1 = 0.45, 
+                    annotation_text = "Declínio", 
+                    annotation_position = "top left", 
+                    fillcolor = "red", 
+                    opacity = 0.20, 
+                    line_width = 0)
+
+    figura_1.add_vline(x = 0.41, 
+                    line_width = 1, 
+                    line_dash = "dash", 
+                    line_color = "red")
+
+    return figura_1
     
 # Sunburst Plot
-figura_2 = px.sunburst(data_frame = df, 
-                    path = ['Categoria', 'Sub-Categoria'], 
-                    values = 'Quantidade', 
-                    color = 'Lucro', 
-                    color_continuous_scale = 'rainbow', 
-                    hover_data = {'Quantidade':True, 'Lucro':True},)
-
-figura_2.update_traces(textfont = {'family':'arial'}, 
-                    textinfo = 'label+percent entry', 
-                    insidetextorientation = 'radial', 
-                    marker = {'line':{'color':'black'}})   
-
-figura_2.update_layout(title = {'text':'Quantidade Vendida e Lucro Para Cada Tipo de Produto', 'font':title_font, 'x':0.5, 'y':0.02, 'xanchor':'center', 'yanchor':'bottom'},
-                    legend = {'font':legend_font}, 
-                    font_color = 'black',
-                    font = global_font,
-                    plot_bgcolor = 'rgba(0,0,0,0)',
-                    paper_bgcolor = 'rgba(0,0,0,0)')
-
-# Função para agrupar os dados por estado
-def agrupa_estados(dataframe):
-
-    # Dataframe de estados agrupados
-    estados = dataframe.groupby(['Estado', 'Codigo_Estado', 'Regiao'], as_index = False).agg({'Venda':'sum', 
-                                                                                              'Lucro':'sum', 
-                                                                                              'Desconto':'mean',
-                                                                                              'Quantidade':'sum'})
-    # Calculando a margem de lucro relativo
-    estados['Margem_Lucro'] = np.multiply(np.divide(estados['Lucro'], estados['Venda']), 100).round(2)
-    
-    # Ordenação
-    estados = estados.sort_values('Venda', ascending = False, ignore_index = True)
-    
-    return estados
+# Construído a partir da tabela já agregada por Categoria/Sub-Categoria (IndiceFiltros.produtos)
+# Os nós são montados diretamente (o mesmo traço do px.sunburst, sem reagrupar um DataFrame a cada filtro):
+# as sub-categorias e, como pais, as categorias, cuja cor é a média do lucro ponderada pela quantidade
+def cria_figura_2(produtos):
+
+    sub_categorias = np.asarray(produtos['Sub-Categoria'], dtype = str)
+    categoria = np.asarray(produtos['Categoria'], dtype = str)
+    quantidade = np.asarray(produtos['Quantidade'], dtype = float)
+    lucro = np.asarray(produtos['Lucro'], dtype = float)
+
+    categorias, posicao = np.unique(categoria, return_inverse = True)
+    quantidade_categoria = np.bincount(posicao, weights = quantidade, minlength = len(categorias))
+    lucro_categoria = np.bincount(posicao, weights = lucro * quantidade, minlength = len(categorias)) / quantidade_categoria
+
+    valores = np.concatenate([quantidade, quantidade_categoria])
+    cores = np.concatenate([lucro, lucro_categoria])
+
+    figura_2 = go.Figure(go.Sunburst(ids = np.concatenate([np.char.add(np.char.add(categoria, '/'), sub_categorias), categorias]),
+                                     labels = np.concatenate([sub_categorias, categorias]),
+                                     parents = np.concatenate([categoria, np.full(len(categorias), '')]),
+                                     values = valores,
+                                     branchvalues = 'total',
+                                     customdata = np.column_stack([valores, cores]),
+                                     hovertemplate = 'labels=%{label}<br>Quantidade=%{customdata[0]}<br>parent=%{parent}<br>id=%{id}<br>Lucro=%{color}<extra></extra>',
+                                     marker = {'colors':cores, 'coloraxis':'coloraxis'},
+                                     name = ''))
+    figura_2.update_layout(coloraxis = {'colorscale':'rainbow', 'colorbar':{'title':{'text':'Lucro'}}}, margin = {'t':60})
+
+    figura_2.update_traces(textfont = {'family':'arial'}, 
+                        textinfo = 'label+percent entry', 
+                        insidetextorientation = 'radial', 
+                        marker = {'line':{'color':'black'}})   
+
+    figura_2.update_layout(title = {'text':'Quantidade Vendida e Lucro Para Cada Tipo de Produto', 'font':title_font, 'x':0.5, 'y':0.02, 'xanchor':'center', 'yanchor':'bottom'},
+                        legend = {'font':legend_font}, 
+                        font_color = 'black',
+                        font = global_font,
+                        plot_bgcolor = 'rgba(0,0,0,0)',
+                        paper_bgcolor = 'rgba(0,0,0,0)')
+
+    return figura_2
+
+# Cubo com os agregados de todas as dimensões, calculado uma única vez
+cubo = CuboAgregado(df)
 
 # Agrupa os dados por estado
-estados_usa = agrupa_estados(df)
+estados_usa = cubo.estados()
+
+# Tabelas cruzadas (mapas de calor), criadas no primeiro uso e mantidas em memória
+cruzadas = {}
+
+def tabela_cruzada(linha, coluna):
+    with trava_dados:
+        if (linha, coluna) not in cruzadas:
+            tabela = TabelaCruzada(df, linha, coluna)
+            for lote in lotes:
+                tabela.incorpora(lote)
+            cruzadas[(linha, coluna)] = tabela
+        return cruzadas[(linha, coluna)]
+
+# Cubo de células para o cross-filter, o box plot e o sunburst, construído uma única vez e atualizado a cada lote ingerido
+indice = IndiceFiltros(df)
+
+# Verifica se o filtro seleciona algum valor
+def filtra(filtro):
+    return any(filtro.values()) if filtro else False
+
+# Cubo restrito ao filtro ativo (o cubo completo quando não há filtro)
+def cubo_filtrado(filtro):
+    if not filtra(filtro):
+        return cubo
+    return indice.cubo(filtro, cubo.versao)
+
+# Tabela cruzada restrita ao filtro ativo
+def cruzada_filtrada(filtro, linha, coluna):
+    if not filtra(filtro):
+        return tabela_cruzada(linha, coluna)
+    return indice.cruzada(filtro, linha, coluna)
+
+# Ingestão incremental: cada lote novo é somado ao cubo e às células do índice, sem reagrupar o dataset inteiro
+# O dataset base continua mapeado em memória; os lotes ficam em uma lista separada (para as estruturas criadas depois)
+trava_dados = threading.Lock()
+lotes = []
+
+def incorpora_lote(novos):
+    global estados_usa
+
+    novos['Margem_Lucro'] = np.multiply(np.divide(novos['Lucro'], novos['Venda']), 100).round(2)
+
+    with trava_dados:
+        lotes.append(novos)
+        cubo.incorpora(novos)
+        for tabela in cruzadas.values():
+            tabela.incorpora(novos)
+        indice.incorpora(novos)
+        estados_usa = cubo.estados()
+
+# INGEST_DIR ativa o monitoramento de um diretório de lotes (ex.: dados/novos)
+INGEST_DIR = os.environ.get('INGEST_DIR')
+INGEST_INTERVAL = float(os.environ.get('INGEST_INTERVAL', 5))
+
+if INGEST_DIR:
+    monitor = MonitorIngestao(INGEST_DIR, incorpora_lote, intervalo = INGEST_INTERVAL).inicia()
 
 # Choropleth Map
-us_map = px.choropleth(data_frame = estados_usa,
-                       locationmode ='USA-states',
-                       locations = 'Codigo_Estado',
-                       scope = 'usa',
-                       color = 'Margem_Lucro',
-                       color_continuous_scale = 'greens_r',
-                       color_continuous_midpoint = 0,
-                       hover_name = 'Estado',
-                       hover_data = {'Estado':False, 'Venda':True, 'Desconto':True, 'Codigo_Estado':False, 'Regiao':True},
-                       labels = {'Margem_Lucro':'Margem de Lucro Bruto','Desconto_mean':'Desconto Médio'},)
-
-us_map.update_layout(title = {'text':'Margem de Lucro Bruto - Mapa USA', 'font':title_font, 'x':0.5, 'y':0.9, 'xanchor':'center', 'yanchor':'middle'},
-                     font = global_font,
-                     font_color = 'black',
-                     geo = dict(bgcolor = 'rgba(0,0,0,0)'),
-                     paper_bgcolor = 'rgba(0,0,0,0)',
-                     plot_bgcolor = 'rgba(0,0,0,0)')
+def cria_mapa(estados_usa):
+
+    us_map = px.choropleth(data_frame = estados_usa,
+                           locationmode ='USA-states',
+                           locations = 'Codigo_Estado',
+                           scope = 'usa',
+                           color = 'Margem_Lucro',
+                           color_continuous_scale = 'greens_r',
+                           color_continuous_midpoint = 0,
+                           hover_name = 'Estado',
+                           hover_data = {'Estado':False, 'Venda':True, 'Desconto':True, 'Codigo_Estado':False, 'Regiao':True},
+                           labels = {'Margem_Lucro':'Margem de Lucro Bruto','Desconto_mean':'Desconto Médio'},)
+
+    us_map.update_layout(title = {'text':'Margem de Lucro Bruto - Mapa USA', 'font':title_font, 'x':0.5, 'y':0.9, 'xanchor':'center', 'yanchor':'middle'},
+                         font = global_font,
+                         font_color = 'black',
+                         geo = dict(bgcolor = 'rgba(0,0,0,0)'),
+                         paper_bgcolor = 'rgba(0,0,0,0)',
+                         plot_bgcolor = 'rgba(0,0,0,0)')
+
+    return us_map
 
 
 ##### App Dash #####
@@ -148,6 +234,23 @@ app = dash.Dash(__name__,
 
 server = app.server
 
+# Cache das figuras geradas pelos callbacks
+# FIGURE_CACHE_DIR permite que vários workers do gunicorn compartilhem o mesmo cache em disco
+figuras = CacheFiguras(capacidade = int(os.environ.get('FIGURE_CACHE_SIZE', 64)),
+                       diretorio = os.environ.get('FIGURE_CACHE_DIR'))
+
+# Versão do dataset usada na chave do cache
+def versao_dados():
+    return cubo.versao
+
+# Métricas (/metrics) e perfis por requisição, quando DASHBOARD_INSTRUMENTACAO=1
+registra_rotas(server)
+
+# Contadores do cache de figuras
+@server.route('/cache-figuras')
+def estatisticas_cache():
+    return jsonify(figuras.estatisticas())
+
 
 ##### Barra Lateral #####
 
@@ -166,6 +269,8 @@ sidebar = html.Div(
             pills = True,
             style = {'fontSize':16}
         ),
+        html.Hr(style = {"borderTop": "1px dotted white"}),
+        html.Div(id = 'filtro-ativo', className = 'text-white', style = {'fontSize':13}),
         html.P(u"Versão 1.0", className = 'fixed-bottom text-white p-2'),
 
     ],
@@ -219,7 +324,11 @@ h_container = dbc.Container(
                                                  selected_style = tab_selected_style,),
                                       ],
                             )
-                )
+                ),
+                dbc.Col(
+                    dbc.Button('Limpar filtros', id = 'limpa-filtro', color = 'secondary', size = 'sm', style = {'margin':'0.5rem'}),
+                    width = 'auto',
+                ),
             ],no_gutters = True, justify = 'around',
         ),       
         
@@ -231,14 +340,14 @@ h_container = dbc.Container(
                                 style = {'margin':'1rem', 'textAlign':'center', 'border':'1px solid white'},
                                 className = 'text-white rounded-lg shadow p-1 bg-dark',
                                ),
-                        html.P('R$ {}'.format(str(locale.format("%.4f", df.Venda.sum().round(2), grouping=True))),
+                        html.P(id = 'total-vendas',
                                 style = {'textAlign':'center','fontColor':'black'}),
                         
                         html.P('Lucro Total', 
                                 style = {'margin':'1rem', 'textAlign':'center', 'border':'1px solid white'},
                                 className='text-white rounded-lg shadow p-1 bg-dark',
                                ),
-                        html.P('R$ {}'.format(str(locale.format("%.4f", df.Lucro.sum().round(2), grouping=True))),
+                        html.P(id = 'total-lucro',
                                 style = {'textAlign':'center','color':'black'}),
                     ],width = 2, style = {"border": "2px solid black", 'borderRight':False},
                 ),
@@ -251,7 +360,7 @@ h_container = dbc.Container(
                 
                 dbc.Col(
                     [
-                        dcc.Graph(id = 'map',figure = us_map)
+                        dcc.Graph(id = 'map',figure = {})
                     ],width = {'size':5, 'offset':0}, style = {"border": "2px solid black", 'borderLeft':False})
             ],no_gutters = True, justify = 'around',
         ), 
@@ -285,7 +394,7 @@ p1_container = dbc.Container(
                 ], width = {'size':6},style={"border": "1px solid black",}),
                 
                 dbc.Col(
-                    dcc.Graph(id = 'sunburst', figure = figura_2, responsive = True),
+                    dcc.Graph(id = 'sunburst', figure = {}, responsive = True),
                     width = {'size':6}, style = {"border": "1px solid black",},
                 ),
             ],no_gutters = True, justify = 'around',
@@ -293,7 +402,7 @@ p1_container = dbc.Container(
         
         dbc.Row(
             [
-                    dcc.Graph(id = 'box', figure = figura_1, responsive = True),
+                    dcc.Graph(id = 'box', figure = {}, responsive = True),
 
             ], no_gutters = True, justify = 'around',
         ),
@@ -396,6 +505,9 @@ content = html.Div(id = "page-content", children = [], style = CONTENT_STYLE )
 app.layout = html.Div(
     [
         dcc.Location(id = "url"),
+        dcc.Store(id = "versao", data = cubo.versao),
+        dcc.Store(id = "filtro", data = {}),
+        dcc.Interval(id = "intervalo", interval = INGEST_INTERVAL * 1000, disabled = not INGEST_DIR),
         sidebar,
         content
     ]
@@ -406,6 +518,7 @@ app.layout = html.Div(
 
 # Calback para renderização das páginas
 @app.callback(Output("page-content", "children"), [Input("url", "pathname")])
+@instrumenta('render_page_content', tipo = 'callback')
 
 def render_page_content(pathname):
     if pathname == "/":
@@ -423,49 +536,131 @@ def render_page_content(pathname):
         ]
     )
 
+# Callback que publica a versão atual do dataset quando chegam novos lotes
+@app.callback(Output('versao', 'data'), [Input('intervalo', 'n_intervals')], [State('versao', 'data')])
+@instrumenta('verifica_versao', tipo = 'callback')
+
+def verifica_versao(n_intervals, atual):
+    if cubo.versao == atual:
+        return dash.no_update
+    return cubo.versao
+
+# Callback do cross-filter: cliques no mapa, no subplot ou no gráfico de estados alternam o filtro da dimensão
+@app.callback([Output('filtro', 'data'), Output('filtro-ativo', 'children')],
+              [Input('map', 'clickData'), Input('subplot', 'clickData'), Input('bar', 'clickData'), Input('limpa-filtro', 'n_clicks')],
+              [State('filtro', 'data')])
+@instrumenta('update_filtro', tipo = 'callback')
+
+def update_filtro(clique_mapa, clique_subplot, clique_barra, n_clicks, filtro):
+    filtro = dict(filtro or {})
+    disparo = dash.callback_context.triggered[0]['prop_id'] if dash.callback_context.triggered else ''
+
+    dimensao, valor = None, None
+    if disparo == 'limpa-filtro.n_clicks':
+        filtro = {}
+    elif disparo == 'map.clickData' and clique_mapa:
+        estados = cubo.estados()
+        codigo = clique_mapa['points'][0]['location']
+        dimensao, valor = 'Estado', estados.loc[estados['Codigo_Estado'] == codigo, 'Estado'].iloc[0]
+    elif disparo == 'subplot.clickData' and clique_subplot:
+        ponto = clique_subplot['points'][0]
+        dimensao, valor = DIMENSOES[ponto['curveNumber']], ponto['x']
+    elif disparo == 'bar.clickData' and clique_barra:
+        dimensao, valor = 'Estado', clique_barra['points'][0]['x']
+
+    # Clicar de novo no mesmo valor remove-o do filtro
+    if dimensao is not None:
+        valores = list(filtro.get(dimensao, []))
+        if valor in valores:
+            valores.remove(valor)
+        else:
+            valores.append(valor)
+        if valores:
+            filtro[dimensao] = valores
+        else:
+            filtro.pop(dimensao, None)
+
+    descricao = [html.P('Filtros:', style = {'marginBottom':'0.2rem'})] + [html.P('{}: {}'.format(dim, ', '.join(map(str, valores))), style = {'marginBottom':'0.2rem'})
+                                                                         for dim, valores in filtro.items()]
+    return filtro, descricao if filtro else ''
+
+# Callback dos totais de vendas e lucro
+@app.callback([Output('total-vendas', 'children'), Output('total-lucro', 'children')], [Input('versao', 'data'), Input('filtro', 'data')])
+@instrumenta('update_totais', tipo = 'callback')
+
+def update_totais(versao, filtro):
+    totais = cubo_filtrado(filtro).totais()
+    return ('R$ {}'.format(str(locale.format("%.4f", round(totais['Venda'], 2), grouping=True))),
+            'R$ {}'.format(str(locale.format("%.4f", round(totais['Lucro'], 2), grouping=True))))
+
+# Callback do mapa de estados
+@app.callback(Output('map', 'figure'), [Input('versao', 'data'), Input('filtro', 'data')])
+@instrumenta('update_mapa', tipo = 'callback')
+@figuras.memoiza('mapa', versao_dados)
+@orcamento(MAX_PONTOS_TRACO)
+
+def update_mapa(versao, filtro):
+    return cria_mapa(cubo_filtrado(filtro).estados())
+
+# Callbacks das figuras estáticas da página 1
+# Só são executados quando a página é aberta pela primeira vez; depois vêm do cache de figuras
+@app.callback(Output('box', 'figure'), [Input('versao', 'data'), Input('filtro', 'data')])
+@instrumenta('update_box', tipo = 'callback')
+@figuras.memoiza('figura_1', versao_dados)
+@orcamento(MAX_PONTOS_TRACO)
+
+def update_box(versao, filtro):
+    return cria_figura_1(*indice.box(filtro, max_outliers = MAX_PONTOS_TRACO or None))
+
+@app.callback(Output('sunburst', 'figure'), [Input('versao', 'data'), Input('filtro', 'data')])
+@instrumenta('update_sunburst', tipo = 'callback')
+@figuras.memoiza('figura_2', versao_dados)
+@orcamento(MAX_PONTOS_TRACO)
+
+def update_sunburst(versao, filtro):
+    return cria_figura_2(indice.produtos(filtro))
+
 # Callback para update dos gráficos de barras
 @app.callback(
     [Output(component_id = 'subplot', component_property = 'figure'),
      Output(component_id = 'bar', component_property = 'figure'),],
-    [Input(component_id = 'radio_options', component_property = 'value')]
+    [Input(component_id = 'radio_options', component_property = 'value'),
+     Input(component_id = 'versao', component_property = 'data'),
+     Input(component_id = 'filtro', component_property = 'data')]
 )
+@instrumenta('update_output', tipo = 'callback')
+@figuras.memoiza('update_output', versao_dados)
+@orcamento(MAX_PONTOS_TRACO)
 
 # Função para update do layout
-def update_output(option):
+def update_output(option, versao, filtro):
     
-    dff = df.copy()
+    fig = make_subplots(rows = 2, cols = 2, shared_yaxes = True)
 
-    dff.round(2)
+    dados = cubo_filtrado(filtro)
+    ship = dados.fatia('Tipo Entrega')
+    seg = dados.fatia('Segmento')
+    reg = dados.fatia('Regiao')
+    cat = dados.fatia('Categoria')
     
     if option == 'Transactions':
         
-        fig = make_subplots(rows = 2, cols = 2, shared_yaxes = True)
-        
-        fig.add_trace(go.Histogram(x = dff['Tipo Entrega'], name = 'Tipo Entrega'), row = 1, col = 1)
+        # Histogramas a partir das contagens do cubo (sem percorrer o dataset)
+        fig.add_trace(go.Histogram(x = ship['Tipo Entrega'], y = ship['Transacoes'], histfunc = 'sum', name = 'Tipo Entrega'), row = 1, col = 1)
         
-        fig.add_trace(go.Histogram(x = dff['Segmento'], name = 'Segmento'), row = 1, col = 2)
+        fig.add_trace(go.Histogram(x = seg['Segmento'], y = seg['Transacoes'], histfunc = 'sum', name = 'Segmento'), row = 1, col = 2)
         
-        fig.add_trace(go.Histogram(x = dff['Regiao'], name = 'Região'), row = 2, col = 1)
+        fig.add_trace(go.Histogram(x = reg['Regiao'], y = reg['Transacoes'], histfunc = 'sum', name = 'Região'), row = 2, col = 1)
         
-        fig.add_trace(go.Histogram(x = dff['Categoria'], name = 'Categoria de Produto'), row = 2, col = 2)
+        fig.add_trace(go.Histogram(x = cat['Categoria'], y = cat['Transacoes'], histfunc = 'sum', name = 'Categoria de Produto'), row = 2, col = 2)
         
     else:
-        fig = make_subplots(rows = 2, cols = 2, shared_yaxes = True)
-        
-        ship = group_by(dff,'Tipo Entrega') 
-        
         fig.add_trace(go.Bar(x = ship['Tipo Entrega'], y = ship[option], name = 'Tipo Entrega'), row = 1, col = 1)
         
-        seg = group_by(dff,'Segmento')
-        
         fig.add_trace(go.Bar(x = seg['Segmento'], y = seg[option], name = 'Segmento'), row = 1, col = 2)
         
-        reg = group_by(dff,'Regiao')
-        
         fig.add_trace(go.Bar(x = reg['Regiao'], y = reg[option], name = 'Região'), row = 2, col = 1)
         
-        cat = group_by(dff,'Categoria')
-        
         fig.add_trace(go.Bar(x = cat['Categoria'], y = cat[option], name = 'Categoria de Produto'), row = 2, col = 2)
         
     fig.update_layout(legend = dict(orientation = "h",
@@ -479,7 +674,7 @@ def update_output(option):
     if option=='Transactions':
         option='Venda'
         
-    figura_3 = px.bar(data_frame = estados_usa, 
+    figura_3 = px.bar(data_frame = dados.estados(), 
                    x = 'Estado', 
                    y = option, 
                    color='Margem_Lucro', 
@@ -496,14 +691,15 @@ def update_output(option):
     return fig, figura_3
 
 # Callback do mapa de calor (gráfico de pixels)
-@app.callback(Output(component_id = 'heat', component_property = 'figure'), [Input(component_id = 'tabs', component_property = 'value')])
-
-def update_output(tab):
-    dff = df.copy()
-    dff['Margem_Lucro'] = np.multiply(np.divide(dff['Lucro'],dff['Venda']),100).round(2)
-    dff.round(2)
-    
-    pro = pd.crosstab(index = dff['Desconto'], columns = dff['Sub-Categoria'], values = dff[tab], aggfunc = np.sum )
+@app.callback(Output(component_id = 'heat', component_property = 'figure'), [Input(component_id = 'tabs', component_property = 'value'),
+                                                                          Input(component_id = 'versao', component_property = 'data'),
+                                                                          Input(component_id = 'filtro', component_property = 'data')])
+@instrumenta('heatmap', tipo = 'callback')
+@figuras.memoiza('heatmap', versao_dados)
+@orcamento(MAX_PONTOS_TRACO)
+
+def update_output(tab, versao, filtro):
+    pro = cruzada_filtrada(filtro, 'Desconto', 'Sub-Categoria').tabela(tab)
     
     figura_3 = px.imshow(pro, 
                       color_continuous_scale = 'greens_r', 
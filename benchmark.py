@@ -0,0 +1,287 @@
+# Benchmark e teste de carga do dashboard de vendas
+#
+# Execute: python benchmark.py --linhas 10000 1000000 10000000 --saida benchmark.json
+#
+# Para cada tamanho, gera um dataset sintético com o mesmo esquema de dados/dataset.csv e mede:
+# tempo de inicialização (a frio, com a conversão do CSV, e a quente, com o cache colunar),
+# tempo de cada callback por valor de entrada (sem e com cache de figuras), pico de memória,
+# tamanho da figura serializada e latência p50/p99 e vazão sob requisições concorrentes.
+
+# Imports
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import resource
+import threading
+import subprocess
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Estados americanos (nome, código, região)
+ESTADOS = [('Alabama', 'AL', 'South'), ('Arizona', 'AZ', 'West'), ('Arkansas', 'AR', 'South'), ('California', 'CA', 'West'),
+           ('Colorado', 'CO', 'West'), ('Connecticut', 'CT', 'East'), ('Delaware', 'DE', 'East'), ('Florida', 'FL', 'South'),
+           ('Georgia', 'GA', 'South'), ('Idaho', 'ID', 'West'), ('Illinois', 'IL', 'Central'), ('Indiana', 'IN', 'Central'),
+           ('Iowa', 'IA', 'Central'), ('Kansas', 'KS', 'Central'), ('Kentucky', 'KY', 'South'), ('Louisiana', 'LA', 'South'),
+           ('Maine', 'ME', 'East'), ('Maryland', 'MD', 'East'), ('Massachusetts', 'MA', 'East'), ('Michigan', 'MI', 'Central'),
+           ('Minnesota', 'MN', 'Central'), ('Mississippi', 'MS', 'South'), ('Missouri', 'MO', 'Central'), ('Montana', 'MT', 'West'),
+           ('Nebraska', 'NE', 'Central'), ('Nevada', 'NV', 'West'), ('New Hampshire', 'NH', 'East'), ('New Jersey', 'NJ', 'East'),
+           ('New Mexico', 'NM', 'West'), ('New York', 'NY', 'East'), ('North Carolina', 'NC', 'South'), ('North Dakota', 'ND', 'Central'),
+           ('Ohio', 'OH', 'East'), ('Oklahoma', 'OK', 'Central'), ('Oregon', 'OR', 'West'), ('Pennsylvania', 'PA', 'East'),
+           ('Rhode Island', 'RI', 'East'), ('South Carolina', 'SC', 'South'), ('South Dakota', 'SD', 'Central'), ('Tennessee', 'TN', 'South'),
+           ('Texas', 'TX', 'Central'), ('Utah', 'UT', 'West'), ('Vermont', 'VT', 'East'), ('Virginia', 'VA', 'South'),
+           ('Washington', 'WA', 'West'), ('West Virginia', 'WV', 'East'), ('Wisconsin', 'WI', 'Central'), ('Wyoming', 'WY', 'West')]
+
+# Categorias e sub-categorias de produtos
+PRODUTOS = {'Furniture': ['Bookcases', 'Chairs', 'Furnishings', 'Tables'],
+            'Office Supplies': ['Appliances', 'Art', 'Binders', 'Envelopes', 'Fasteners', 'Labels', 'Paper', 'Storage', 'Supplies'],
+            'Technology': ['Accessories', 'Copiers', 'Machines', 'Phones']}
+
+SEGMENTOS = ['Consumer', 'Corporate', 'Home Office']
+TIPOS_ENTREGA = ['Standard Class', 'Second Class', 'First Class', 'Same Day']
+DESCONTOS = [0.0, 0.1, 0.15, 0.2, 0.3, 0.32, 0.4, 0.45, 0.5, 0.6, 0.7, 0.8]
+
+# Filtros medidos no cross-filter
+FILTROS = [{'Regiao': ['West']},
+           {'Estado': ['California', 'Texas'], 'Segmento': ['Consumer']},
+           {'Regiao': ['East'], 'Categoria': ['Technology'], 'Tipo Entrega': ['First Class']}]
+
+# Callbacks medidos: (nome, saídas, entrada variável, valores da entrada, recebe a versão do dataset e o filtro)
+CALLBACKS = [('render_page_content', [('page-content', 'children')], ('url', 'pathname'), ['/', '/pagina-1', '/pagina-2'], False),
+             ('update_output', [('subplot', 'figure'), ('bar', 'figure')], ('radio_options', 'value'), ['Transactions', 'Venda', 'Lucro', 'Quantidade', 'Desconto'], True),
+             ('heatmap', [('heat', 'figure')], ('tabs', 'value'), ['Quantidade', 'Lucro'], True),
+             ('update_mapa', [('map', 'figure')], None, [None], True),
+             ('update_box', [('box', 'figure')], None, [None], True),
+             ('update_sunburst', [('sunburst', 'figure')], None, [None], True)]
+
+# Gera um dataset sintético e grava em CSV, em blocos para limitar a memória
+def gera_dataset(linhas, arquivo, semente = 42, bloco = 1000000):
+    gerador = np.random.default_rng(semente)
+    categorias = [c for c, subs in PRODUTOS.items() for _ in subs]
+    sub_categorias = [s for subs in PRODUTOS.values() for s in subs]
+
+    for inicio in range(0, linhas, bloco):
+        n = min(bloco, linhas - inicio)
+        estado = gerador.integers(0, len(ESTADOS), n)
+        produto = gerador.integers(0, len(sub_categorias), n)
+        desconto = np.array(DESCONTOS)[gerador.integers(0, len(DESCONTOS), n)]
+        venda = np.round(gerador.lognormal(4, 1.3, n), 2)
+        margem = gerador.normal(0.25, 0.15, n) - 1.2 * desconto
+
+        dados = pd.DataFrame({'Tipo Entrega': np.array(TIPOS_ENTREGA)[gerador.integers(0, len(TIPOS_ENTREGA), n)],
+                              'Segmento': np.array(SEGMENTOS)[gerador.integers(0, len(SEGMENTOS), n)],
+                              'Estado': np.array([e[0] for e in ESTADOS])[estado],
+                              'Codigo_Estado': np.array([e[1] for e in ESTADOS])[estado],
+                              'Regiao': np.array([e[2] for e in ESTADOS])[estado],
+                              'Categoria': np.array(categorias)[produto],
+                              'Sub-Categoria': np.array(sub_categorias)[produto],
+                              'Venda': venda,
+                              'Quantidade': gerador.integers(1, 15, n),
+                              'Desconto': desconto,
+                              'Lucro': np.round(venda * margem, 4)})
+        dados.to_csv(arquivo, mode = 'w' if inicio == 0 else 'a', header = inicio == 0, index = False)
+
+# Gera combinações aleatórias de filtros (1 a 3 dimensões, 1 a 3 valores em cada) para o teste de carga
+# Com filtros diferentes, as requisições passam pelo índice de filtros e pelo cubo, e não só pelo cache de figuras
+def gera_filtros(quantidade, semente = 7):
+    gerador = np.random.default_rng(semente)
+    valores = {'Estado': [e[0] for e in ESTADOS],
+               'Regiao': sorted({e[2] for e in ESTADOS}),
+               'Segmento': SEGMENTOS,
+               'Categoria': list(PRODUTOS),
+               'Tipo Entrega': TIPOS_ENTREGA}
+
+    filtros = []
+    for _ in range(quantidade):
+        dimensoes = gerador.choice(list(valores), gerador.integers(1, 4), replace = False)
+        filtros.append({str(dim): sorted(str(v) for v in gerador.choice(valores[dim], min(len(valores[dim]), gerador.integers(1, 4)), replace = False))
+                        for dim in dimensoes})
+    return filtros
+
+# Monta o corpo de uma requisição de callback do Dash
+def requisicao_dash(saidas, entrada, valor, usa_versao, versao, filtro = None):
+    inputs = []
+    if entrada is not None:
+        inputs.append({'id': entrada[0], 'property': entrada[1], 'value': valor})
+    if usa_versao:
+        inputs.append({'id': 'versao', 'property': 'data', 'value': versao})
+        inputs.append({'id': 'filtro', 'property': 'data', 'value': filtro or {}})
+
+    if len(saidas) == 1:
+        output = '{}.{}'.format(*saidas[0])
+        outputs = {'id': saidas[0][0], 'property': saidas[0][1]}
+    else:
+        output = '..' + '...'.join('{}.{}'.format(*s) for s in saidas) + '..'
+        outputs = [{'id': i, 'property': p} for i, p in saidas]
+
+    return {'output': output,
+            'outputs': outputs,
+            'inputs': inputs,
+            'changedPropIds': ['{}.{}'.format(inputs[0]['id'], inputs[0]['property'])]}
+
+# Percentil de uma lista de latências (em ms)
+def percentil(latencias, p):
+    return float(np.percentile(latencias, p) * 1000) if latencias else None
+
+
+# Mede um processo do dashboard já configurado com o dataset (executado em um subprocesso)
+def executa_worker(requisicoes, concorrencia):
+    inicio = time.perf_counter()
+    import app
+    resultado = {'inicializacao_s': time.perf_counter() - inicio, 'linhas': len(app.df), 'callbacks': []}
+
+    cliente = app.server.test_client()
+    versao = app.cubo.versao
+
+    # Tempo por callback e valor de entrada: a primeira chamada calcula a figura, a segunda vem do cache
+    # O pico de memória é medido em uma terceira chamada, com tracemalloc, para não distorcer os tempos
+    for nome, saidas, entrada, valores, usa_versao in CALLBACKS:
+        for valor in valores:
+            corpo = requisicao_dash(saidas, entrada, valor, usa_versao, versao)
+            app.figuras.limpa()
+
+            t0, c0 = time.perf_counter(), time.process_time()
+            resposta = cliente.post('/_dash-update-component', json = corpo)
+            t1, c1 = time.perf_counter(), time.process_time()
+            cliente.post('/_dash-update-component', json = corpo)
+            t2 = time.perf_counter()
+
+            app.figuras.limpa()
+            tracemalloc.start()
+            cliente.post('/_dash-update-component', json = corpo)
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            resultado['callbacks'].append({'callback': nome,
+                                           'valor': valor,
+                                           'status': resposta.status_code,
+                                           'tempo_ms': (t1 - t0) * 1000,
+                                           'cpu_ms': (c1 - c0) * 1000,
+                                           'tempo_cache_ms': (t2 - t1) * 1000,
+                                           'pico_memoria_bytes': pico,
+                                           'tamanho_resposta_bytes': len(resposta.data)})
+
+    # Cross-filter: tempo de cada callback que recebe o filtro (subplot, mapa de calor, mapa, box plot e sunburst)
+    resultado['filtros'] = []
+    for filtro in FILTROS:
+        tempos = {}
+        for nome, saidas, entrada, valores, usa_versao in CALLBACKS[1:]:
+            app.figuras.limpa()
+            t0 = time.perf_counter()
+            resposta = cliente.post('/_dash-update-component', json = requisicao_dash(saidas, entrada, valores[min(1, len(valores) - 1)], usa_versao, versao, filtro))
+            tempos[nome + '_ms'] = (time.perf_counter() - t0) * 1000
+        resultado['filtros'].append(dict(tempos, filtro = filtro, status = resposta.status_code))
+
+    # Teste de carga via HTTP contra o servidor Flask
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class HandlerSilencioso(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    servidor = make_server('127.0.0.1', 0, app.server, threaded = True, request_handler = HandlerSilencioso)
+    threading.Thread(target = servidor.serve_forever, daemon = True).start()
+    url = 'http://127.0.0.1:{}/_dash-update-component'.format(servidor.server_port)
+
+    # Cada requisição combina um callback, um valor de entrada e um filtro diferente
+    entradas = [(saidas, entrada, valor, usa_versao) for _, saidas, entrada, valores, usa_versao in CALLBACKS[1:3] for valor in valores]
+    filtros = gera_filtros(requisicoes)
+    corpos = [json.dumps(requisicao_dash(*entradas[i % len(entradas)], versao, filtros[i])).encode('utf-8') for i in range(requisicoes)]
+    app.figuras.limpa()
+
+    def envia(i):
+        pedido = urllib.request.Request(url, data = corpos[i], headers = {'Content-Type': 'application/json'})
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(pedido) as resposta:
+            resposta.read()
+        return time.perf_counter() - t0
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = concorrencia) as executor:
+        latencias = list(executor.map(envia, range(requisicoes)))
+    duracao = time.perf_counter() - inicio
+    servidor.shutdown()
+
+    resultado['carga'] = {'requisicoes': requisicoes,
+                          'concorrencia': concorrencia,
+                          'corpos_distintos': len(set(corpos)),
+                          'p50_ms': percentil(latencias, 50),
+                          'p99_ms': percentil(latencias, 99),
+                          'vazao_rps': requisicoes / duracao}
+    resultado['pico_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return resultado
+
+# Executa o worker em um subprocesso com o dataset indicado
+def mede(arquivo, requisicoes, concorrencia, somente_inicializacao = False):
+    comando = [sys.executable, os.path.abspath(__file__), '--worker', '--requisicoes', str(requisicoes), '--concorrencia', str(concorrencia)]
+    if somente_inicializacao:
+        comando.append('--somente-inicializacao')
+
+    ambiente = dict(os.environ, DASHBOARD_DATASET = arquivo)
+    ambiente.pop('FIGURE_CACHE_DIR', None)
+    ambiente.pop('INGEST_DIR', None)
+
+    saida = subprocess.run(comando, env = ambiente, cwd = os.path.dirname(os.path.abspath(__file__)),
+                           check = True, stdout = subprocess.PIPE).stdout
+    return json.loads(saida.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Benchmark do dashboard de vendas')
+    parser.add_argument('--linhas', type = int, nargs = '+', default = [10000, 1000000, 10000000])
+    parser.add_argument('--saida', default = 'benchmark.json')
+    parser.add_argument('--diretorio', default = None, help = 'onde gravar os datasets sintéticos (padrão: diretório temporário)')
+    parser.add_argument('--requisicoes', type = int, default = 200)
+    parser.add_argument('--concorrencia', type = int, default = 8)
+    parser.add_argument('--worker', action = 'store_true', help = argparse.SUPPRESS)
+    parser.add_argument('--somente-inicializacao', action = 'store_true', help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        if args.somente_inicializacao:
+            inicio = time.perf_counter()
+            import app
+            print(json.dumps({'inicializacao_s': time.perf_counter() - inicio}))
+        else:
+            print(json.dumps(executa_worker(args.requisicoes, args.concorrencia)))
+        return
+
+    diretorio = args.diretorio or tempfile.mkdtemp(prefix = 'benchmark-dashboard-')
+    os.makedirs(diretorio, exist_ok = True)
+    relatorio = {'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'python': platform.python_version(),
+                 'plataforma': platform.platform(),
+                 'resultados': []}
+
+    for linhas in args.linhas:
+        arquivo = os.path.join(diretorio, 'dataset_{}.csv'.format(linhas))
+        print("Gerando dataset com {} linhas...".format(linhas))
+        inicio = time.perf_counter()
+        gera_dataset(linhas, arquivo)
+        geracao = time.perf_counter() - inicio
+
+        # Primeira inicialização converte o CSV; as seguintes usam o cache colunar
+        frio = mede(arquivo, args.requisicoes, args.concorrencia, somente_inicializacao = True)
+        resultado = mede(arquivo, args.requisicoes, args.concorrencia)
+        resultado['geracao_dataset_s'] = geracao
+        resultado['inicializacao_fria_s'] = frio['inicializacao_s']
+        relatorio['resultados'].append(resultado)
+
+        print("{} linhas: inicialização {:.2f}s (fria {:.2f}s), p50 {:.1f} ms, p99 {:.1f} ms, {:.1f} req/s".format(
+            linhas, resultado['inicializacao_s'], frio['inicializacao_s'], resultado['carga']['p50_ms'],
+            resultado['carga']['p99_ms'], resultado['carga']['vazao_rps']))
+
+    with open(args.saida, 'w', encoding = 'utf-8') as f:
+        json.dump(relatorio, f, indent = 2)
+    print("Resultados gravados em", args.saida)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# Carregador colunar do dataset: converte o CSV uma única vez para arquivos .npy por coluna
+# e abre cada coluna com memory-map, de modo que os workers compartilhem as mesmas páginas
+
+# Imports
+import os
+import json
+import fcntl
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Colunas armazenadas como códigos de dicionário (categorias)
+CATEGORICAS = ['Estado', 'Codigo_Estado', 'Regiao', 'Categoria', 'Sub-Categoria', 'Segmento', 'Tipo Entrega']
+
+# Nome do arquivo de manifesto dentro do diretório do cache
+MANIFESTO = 'manifesto.json'
+
+# Sufixo do arquivo de trava, ao lado do diretório do cache
+TRAVA = '.trava'
+
+
+# Identifica a versão do CSV de origem (tamanho e data de modificação)
+def origem_csv(arquivo_csv):
+    info = os.stat(arquivo_csv)
+    return {'arquivo': os.path.abspath(arquivo_csv), 'tamanho': info.st_size, 'modificado': info.st_mtime_ns}
+
+# Verifica se o cache colunar existe e corresponde ao CSV atual
+def cache_valido(arquivo_csv, diretorio):
+    try:
+        with open(os.path.join(diretorio, MANIFESTO), encoding = 'utf-8') as f:
+            manifesto = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifesto.get('origem') == origem_csv(arquivo_csv)
+
+# Converte o CSV para o formato colunar
+def converte_csv(arquivo_csv, diretorio):
+    df = pd.read_csv(arquivo_csv)
+
+    # Escrevemos em um diretório temporário e depois renomeamos, para que nenhum worker leia um cache incompleto
+    pai = os.path.dirname(os.path.abspath(diretorio))
+    temporario = tempfile.mkdtemp(dir = pai, prefix = '.colunar-')
+
+    colunas = []
+    for i, nome in enumerate(df.columns):
+        arquivo = 'coluna_{}.npy'.format(i)
+        serie = df[nome]
+
+        # Colunas de texto são sempre codificadas como dicionário, mesmo fora da lista CATEGORICAS
+        if nome in CATEGORICAS or not pd.api.types.is_numeric_dtype(serie):
+            categorica = serie.astype('category')
+            np.save(os.path.join(temporario, arquivo), categorica.cat.codes.values)
+            colunas.append({'nome': nome, 'arquivo': arquivo, 'tipo': 'categorica',
+                            'categorias': [str(c) for c in categorica.cat.categories]})
+        else:
+            np.save(os.path.join(temporario, arquivo), serie.values)
+            colunas.append({'nome': nome, 'arquivo': arquivo, 'tipo': 'numerica'})
+
+    with open(os.path.join(temporario, MANIFESTO), 'w', encoding = 'utf-8') as f:
+        json.dump({'origem': origem_csv(arquivo_csv), 'linhas': len(df), 'colunas': colunas}, f, ensure_ascii = False)
+
+    # Substitui o cache antigo (se houver); quem chama tem a trava exclusiva, então nenhum worker
+    # está abrindo o diretório antigo, e as colunas já mapeadas continuam válidas depois de apagadas
+    if os.path.isdir(diretorio):
+        antigo = temporario + '-antigo'
+        os.rename(diretorio, antigo)
+        shutil.rmtree(antigo, ignore_errors = True)
+    os.rename(temporario, diretorio)
+
+# Abre o cache colunar sem copiar os dados (memory-map somente leitura)
+def abre_colunar(diretorio):
+    with open(os.path.join(diretorio, MANIFESTO), encoding = 'utf-8') as f:
+        manifesto = json.load(f)
+
+    dados = {}
+    for coluna in manifesto['colunas']:
+        valores = np.load(os.path.join(diretorio, coluna['arquivo']), mmap_mode = 'r')
+        if coluna['tipo'] == 'categorica':
+            valores = pd.Categorical.from_codes(valores, categories = coluna['categorias'])
+        dados[coluna['nome']] = valores
+
+    return pd.DataFrame(dados, copy = False)
+
+# Carrega o dataset, convertendo o CSV apenas quando o cache não existe ou está desatualizado
+# Os workers do gunicorn iniciam juntos: a conversão é feita com a trava exclusiva e a abertura com a
+# trava compartilhada, então só um worker converte e nenhum troca o diretório enquanto outro o abre
+def carrega_dataset(arquivo_csv, diretorio = None):
+    if diretorio is None:
+        diretorio = os.path.splitext(arquivo_csv)[0] + '.colunar'
+
+    with open(diretorio.rstrip(os.sep) + TRAVA, 'a') as trava:
+        fcntl.flock(trava, fcntl.LOCK_SH)
+        if not cache_valido(arquivo_csv, diretorio):
+
+            # A troca da trava não é atômica: outro worker pode ter convertido nesse intervalo
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            if not cache_valido(arquivo_csv, diretorio):
+                converte_csv(arquivo_csv, diretorio)
+            fcntl.flock(trava, fcntl.LOCK_SH)
+
+        return abre_colunar(diretorio)
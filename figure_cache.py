@@ -0,0 +1,134 @@
+# Cache de figuras (memoização) para os callbacks do dashboard
+
+# Imports
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import threading
+import functools
+from collections import OrderedDict
+
+
+# Ordena as listas de valores de um dicionário (ex.: o filtro ativo), recursivamente
+def normaliza(valor):
+    if isinstance(valor, dict):
+        return {chave: sorted(item, key = str) if isinstance(item, list) else normaliza(item) for chave, item in valor.items()}
+    return valor
+
+
+# Cache LRU em memória, com um diretório opcional compartilhado entre os workers do gunicorn
+class CacheFiguras:
+
+    def __init__(self, capacidade = 128, diretorio = None):
+        self.capacidade = capacidade
+        self.diretorio = diretorio
+        self.acertos = 0
+        self.acertos_disco = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+        if self.diretorio:
+            os.makedirs(self.diretorio, exist_ok = True)
+
+    # Caminho do arquivo de uma chave no diretório compartilhado
+    def _arquivo(self, chave):
+        nome = hashlib.sha1(repr(chave).encode('utf-8')).hexdigest()
+        return os.path.join(self.diretorio, nome + '.pkl')
+
+    # Busca uma figura: primeiro na memória, depois no disco
+    def obtem(self, chave):
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return True, self._itens[chave]
+
+        if self.diretorio:
+            arquivo = self._arquivo(chave)
+            try:
+                with open(arquivo, 'rb') as f:
+                    valor = pickle.load(f)
+                os.utime(arquivo)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                self._guarda_memoria(chave, valor)
+                with self._trava:
+                    self.acertos_disco += 1
+                return True, valor
+
+        with self._trava:
+            self.falhas += 1
+        return False, None
+
+    # Guarda uma figura na memória e, se configurado, no disco
+    def guarda(self, chave, valor):
+        self._guarda_memoria(chave, valor)
+
+        if self.diretorio:
+
+            # Escrita atômica para que outro worker nunca leia um arquivo incompleto
+            fd, temporario = tempfile.mkstemp(dir = self.diretorio, suffix = '.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(valor, f, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, self._arquivo(chave))
+            self._limpa_disco()
+
+    def _guarda_memoria(self, chave, valor):
+        with self._trava:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last = False)
+
+    # Remove do disco os arquivos usados há mais tempo quando a capacidade é excedida
+    def _limpa_disco(self):
+        arquivos = [os.path.join(self.diretorio, nome) for nome in os.listdir(self.diretorio) if nome.endswith('.pkl')]
+        if len(arquivos) <= self.capacidade:
+            return
+
+        arquivos.sort(key = lambda arquivo: os.stat(arquivo).st_mtime if os.path.exists(arquivo) else 0)
+        for arquivo in arquivos[:len(arquivos) - self.capacidade]:
+            try:
+                os.remove(arquivo)
+            except OSError:
+                pass
+
+    # Esvazia o cache em memória (o disco é limpo pela própria rotação LRU)
+    def limpa(self):
+        with self._trava:
+            self._itens.clear()
+
+    # Contadores de acertos e falhas
+    def estatisticas(self):
+        with self._trava:
+            total = self.acertos + self.acertos_disco + self.falhas
+            return {'acertos': self.acertos,
+                    'acertos_disco': self.acertos_disco,
+                    'falhas': self.falhas,
+                    'taxa_acerto': (self.acertos + self.acertos_disco) / total if total else 0.0,
+                    'itens': len(self._itens),
+                    'capacidade': self.capacidade}
+
+    # Decorator: a chave é (nome do callback, valores de entrada, versão do dataset)
+    # As listas dentro dos dicionários (valores de cada dimensão do filtro) são ordenadas na chave:
+    # ['CA', 'TX'] e ['TX', 'CA'] selecionam as mesmas linhas e usam a mesma figura
+    # As entradas são serializadas em JSON porque podem ser dicionários (ex.: o filtro ativo)
+    def memoiza(self, nome, versao):
+        def decorator(funcao):
+
+            @functools.wraps(funcao)
+            def wrapper(*args):
+                chave = (nome, json.dumps([normaliza(arg) for arg in args], sort_keys = True, default = str), versao())
+                encontrado, valor = self.obtem(chave)
+                if encontrado:
+                    return valor
+                valor = funcao(*args)
+                self.guarda(chave, valor)
+                return valor
+
+            return wrapper
+        return decorator
@@ -0,0 +1,67 @@
+# Ingestão incremental (append-only) de novos lotes de vendas para o dashboard
+# Os produtores devem gravar cada lote com outro nome e renomeá-lo para .csv/.parquet ao final,
+# para que o monitor nunca leia um arquivo pela metade.
+
+# Imports
+import os
+import threading
+import pandas as pd
+
+# Extensões aceitas no diretório monitorado
+EXTENSOES = ('.csv', '.parquet')
+
+
+# Função para ler um lote de novas linhas
+def le_lote(arquivo):
+    if arquivo.endswith('.parquet'):
+        return pd.read_parquet(arquivo)
+    return pd.read_csv(arquivo)
+
+# Monitor de um diretório de lotes: cada arquivo novo é lido uma única vez e entregue ao callback
+class MonitorIngestao:
+
+    def __init__(self, diretorio, ao_receber, intervalo = 5.0):
+        self.diretorio = diretorio
+        self.ao_receber = ao_receber
+        self.intervalo = intervalo
+        self.processados = set()
+        self._thread = None
+        self._parar = threading.Event()
+
+    # Processa os arquivos ainda não vistos, em ordem de nome
+    def verifica(self):
+        try:
+            nomes = sorted(os.listdir(self.diretorio))
+        except FileNotFoundError:
+            return 0
+
+        total = 0
+        for nome in nomes:
+            if not nome.endswith(EXTENSOES) or nome in self.processados:
+                continue
+
+            novos = le_lote(os.path.join(self.diretorio, nome))
+            self.processados.add(nome)
+            if len(novos):
+                self.ao_receber(novos)
+                total += len(novos)
+
+        return total
+
+    def _executa(self):
+        while not self._parar.is_set():
+            try:
+                self.verifica()
+            except Exception as e:
+                print("Erro na ingestão de {}: {}".format(self.diretorio, e))
+            self._parar.wait(self.intervalo)
+
+    # Inicia o monitor em uma thread em segundo plano
+    def inicia(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target = self._executa, name = 'ingestao', daemon = True)
+            self._thread.start()
+        return self
+
+    def para(self):
+        self._parar.set()
@@ -0,0 +1,165 @@
+# Instrumentação opcional do dashboard: tempo, CPU, memória alocada e tamanho da saída
+# de cada callback e de cada etapa de agregação, expostos em /metrics no formato do Prometheus.
+#
+# Ative com DASHBOARD_INSTRUMENTACAO=1. Com DASHBOARD_INSTRUMENTACAO_MEMORIA=1 a memória
+# alocada também é medida (via tracemalloc, que deixa tudo mais lento).
+# Com a instrumentação ativa, o cabeçalho X-Profile: 1 (ou X-Profile: pyinstrument)
+# grava o perfil da requisição em DASHBOARD_PROFILE_DIR.
+
+# Imports
+import os
+import time
+import json
+import cProfile
+import threading
+import functools
+import tracemalloc
+from flask import Response, request, g
+
+ATIVO = os.environ.get('DASHBOARD_INSTRUMENTACAO', '0') == '1'
+MEDE_MEMORIA = ATIVO and os.environ.get('DASHBOARD_INSTRUMENTACAO_MEMORIA', '0') == '1'
+DIRETORIO_PERFIS = os.environ.get('DASHBOARD_PROFILE_DIR', 'perfis')
+
+# Limites (em segundos) do histograma de duração
+LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+if MEDE_MEMORIA:
+    tracemalloc.start()
+
+
+# Registro das métricas acumuladas por (tipo, nome)
+class Registro:
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.series = {}
+
+    def registra(self, tipo, nome, segundos, cpu, alocado = None, tamanho = None):
+        with self._trava:
+            serie = self.series.setdefault((tipo, nome), {'chamadas': 0, 'segundos': 0.0, 'cpu': 0.0,
+                                                          'alocado': 0, 'tamanho': 0, 'buckets': [0] * len(LIMITES)})
+            serie['chamadas'] += 1
+            serie['segundos'] += segundos
+            serie['cpu'] += cpu
+            if alocado is not None:
+                serie['alocado'] += max(alocado, 0)
+            if tamanho is not None:
+                serie['tamanho'] += tamanho
+            for i, limite in enumerate(LIMITES):
+                if segundos <= limite:
+                    serie['buckets'][i] += 1
+
+    # Texto no formato de exposição do Prometheus
+    def exposicao(self):
+        linhas = ['# HELP dashboard_duracao_segundos Tempo de parede por callback ou etapa',
+                  '# TYPE dashboard_duracao_segundos histogram']
+        with self._trava:
+            series = {chave: dict(valor, buckets = list(valor['buckets'])) for chave, valor in self.series.items()}
+
+        for (tipo, nome), serie in sorted(series.items()):
+            rotulos = 'tipo="{}",nome="{}"'.format(tipo, nome)
+            for limite, contagem in zip(LIMITES, serie['buckets']):
+                linhas.append('dashboard_duracao_segundos_bucket{{{},le="{}"}} {}'.format(rotulos, limite, contagem))
+            linhas.append('dashboard_duracao_segundos_bucket{{{},le="+Inf"}} {}'.format(rotulos, serie['chamadas']))
+            linhas.append('dashboard_duracao_segundos_sum{{{}}} {}'.format(rotulos, serie['segundos']))
+            linhas.append('dashboard_duracao_segundos_count{{{}}} {}'.format(rotulos, serie['chamadas']))
+
+        contadores = [('dashboard_cpu_segundos_total', 'cpu', 'Tempo de CPU por callback ou etapa'),
+                      ('dashboard_bytes_alocados_total', 'alocado', 'Bytes alocados (com DASHBOARD_INSTRUMENTACAO_MEMORIA=1)'),
+                      ('dashboard_saida_bytes_total', 'tamanho', 'Tamanho da saída serializada')]
+        for metrica, campo, ajuda in contadores:
+            linhas.append('# HELP {} {}'.format(metrica, ajuda))
+            linhas.append('# TYPE {} counter'.format(metrica))
+            for (tipo, nome), serie in sorted(series.items()):
+                linhas.append('{}{{tipo="{}",nome="{}"}} {}'.format(metrica, tipo, nome, serie[campo]))
+
+        return '\n'.join(linhas) + '\n'
+
+
+registro = Registro()
+
+
+# Tamanho da saída de um callback serializada como o Dash faz (figuras Plotly em JSON)
+def serializa(resultado):
+    import plotly
+    inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+    try:
+        texto = json.dumps(resultado, cls = plotly.utils.PlotlyJSONEncoder)
+    except TypeError:
+
+        # Ex.: dash.no_update, que não é enviado ao navegador
+        return None
+    registro.registra('serializacao', 'json', time.perf_counter() - inicio, time.thread_time() - inicio_cpu, tamanho = len(texto))
+    return len(texto)
+
+# Decorator que mede uma função; sem a instrumentação ativa, devolve a própria função
+# Nos callbacks (tipo='callback') também mede o tamanho da resposta serializada
+def instrumenta(nome, tipo = 'agregacao'):
+    def decorator(funcao):
+        if not ATIVO:
+            return funcao
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            memoria = tracemalloc.get_traced_memory()[0] if MEDE_MEMORIA else None
+            inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+
+            resultado = funcao(*args, **kwargs)
+
+            segundos, cpu = time.perf_counter() - inicio, time.thread_time() - inicio_cpu
+            alocado = tracemalloc.get_traced_memory()[0] - memoria if MEDE_MEMORIA else None
+            tamanho = serializa(resultado) if tipo == 'callback' else None
+            registro.registra(tipo, nome, segundos, cpu, alocado, tamanho)
+
+            return resultado
+
+        return wrapper
+    return decorator
+
+
+# Inicia o perfil da requisição quando o cabeçalho X-Profile é enviado
+def _inicia_perfil():
+    modo = request.headers.get('X-Profile')
+    if not modo:
+        return
+
+    if modo == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            return
+        g.perfil = ('pyinstrument', Profiler())
+        g.perfil[1].start()
+    else:
+        g.perfil = ('cprofile', cProfile.Profile())
+        g.perfil[1].enable()
+
+# Grava o perfil da requisição em DIRETORIO_PERFIS
+def _finaliza_perfil(resposta):
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return resposta
+
+    os.makedirs(DIRETORIO_PERFIS, exist_ok = True)
+    base = os.path.join(DIRETORIO_PERFIS, '{}-{}{}'.format(time.strftime('%Y%m%d-%H%M%S'), time.time_ns() % 1000000000, request.path.replace('/', '_')))
+    if perfil[0] == 'pyinstrument':
+        perfil[1].stop()
+        with open(base + '.html', 'w', encoding = 'utf-8') as f:
+            f.write(perfil[1].output_html())
+    else:
+        perfil[1].disable()
+        perfil[1].dump_stats(base + '.prof')
+
+    return resposta
+
+# Registra o endpoint /metrics e os ganchos de perfil no servidor Flask
+def registra_rotas(server):
+    if not ATIVO:
+        return
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(registro.exposicao(), mimetype = 'text/plain; version=0.0.4')
+
+    server.before_request(_inicia_perfil)
+    server.after_request(_finaliza_perfil)
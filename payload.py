@@ -0,0 +1,59 @@
+# Orçamento de payload: limita o número de pontos enviados ao navegador em cada traço
+
+# Imports
+import functools
+import numpy as np
+
+# Índices de uma amostragem uniforme (sempre inclui o primeiro e o último ponto)
+def indices_amostra(total, maximo):
+    return np.unique(np.linspace(0, total - 1, maximo).round().astype(int))
+
+# Atributos de um traço (incluindo os aninhados, ex.: ('marker', 'color')) que são arrays de uma dimensão
+# Listas de objetos (ex.: dimensions) não são valores por ponto
+def atributos_array(valores, caminho = ()):
+    for nome, valor in valores.items():
+        if isinstance(valor, dict):
+            yield from atributos_array(valor, caminho + (nome,))
+        elif not isinstance(valor, str) and np.ndim(valor) == 1 and len(valor) and not isinstance(valor[0], dict):
+            yield caminho + (nome,), valor
+
+# Reduz todos os traços de uma figura que excedem o orçamento de pontos
+# Todos os arrays com o tamanho do traço (x, y, z, locations, q1/median/q3, marker.color, marker.size...)
+# são amostrados com os mesmos índices, para que continuem alinhados com os pontos mantidos
+def limita_pontos(figura, maximo):
+    if not maximo:
+        return figura
+
+    for traco in figura.data:
+        valores = traco.to_plotly_json()
+
+        # Traços com z em duas dimensões (heatmap, contour, surface) têm um valor por célula x/y:
+        # amostrar x ou y sem as linhas e colunas de z desalinharia a matriz, então eles não são reduzidos
+        if np.ndim(valores.get('z')) == 2:
+            continue
+
+        arrays = list(atributos_array(valores))
+        total = max((len(valor) for _, valor in arrays), default = 0)
+        if total <= maximo:
+            continue
+
+        indices = indices_amostra(total, maximo)
+        for caminho, valor in arrays:
+            if len(valor) == total:
+                traco[caminho] = np.asarray(valor)[indices]
+
+    return figura
+
+# Decorator que aplica o orçamento às figuras retornadas por um callback
+def orcamento(maximo):
+    def decorator(funcao):
+
+        @functools.wraps(funcao)
+        def wrapper(*args):
+            resultado = funcao(*args)
+            if isinstance(resultado, tuple):
+                return tuple(limita_pontos(figura, maximo) if hasattr(figura, 'data') else figura for figura in resultado)
+            return limita_pontos(resultado, maximo) if hasattr(resultado, 'data') else resultado
+
+        return wrapper
+    return decorator